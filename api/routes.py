@@ -1,14 +1,20 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Response
 from pydantic import BaseModel
 from typing import List, Optional
 from utils.mcp_client import (
-    get_logs, add_log_entry,
-    openrouter_chat_completion, classify_intent, get_intent_categories
+    get_logs, aadd_log_entries, run_log_io, log_generation,
+    openrouter_chat_completion_async, classify_intent
 )
+from utils.intent_taxonomy import get_taxonomy
+from utils.tool_client import ToolClient, get_tool_client
+from utils.health import HealthMonitor, probe_openrouter
+from utils.jobs import JobManager, JobNotFound
+from utils.log_stream import log_broadcaster
+from sse_starlette.sse import EventSourceResponse
 from datetime import datetime
+import asyncio
+import hashlib
 import re
-import subprocess
-import sys
 import json
 
 router = APIRouter()
@@ -30,21 +36,95 @@ class ProcessedMessageModel(BaseModel):
     suggestion: str
     used_template: bool
 
+class JobRequestModel(BaseModel):
+    messages: List[MessageModel]
+    priority: int = 0
+
 PROMPT_FILE = 'data/prompt.txt'
+AUTOMATION_STATUS_FILE = 'data/auto_dm_status.json'
+
+# Health checks only look at a running worker; starting one would log in to Instagram
+_health_client = ToolClient(autostart=False, pool_size=1)
+
+def _probe_instagram():
+    # The tool worker holds the Instagram session and its own cached probe
+    try:
+        status = _health_client.call("get_system_status", timeout=10)
+    except (FileNotFoundError, ConnectionRefusedError):
+        return "worker_not_running"
+    if not status.get("success"):
+        raise RuntimeError(status.get("error", "get_system_status failed"))
+    return status["status"]["instagram_connection"]
+
+health_monitor = HealthMonitor({"instagram": _probe_instagram, "openrouter": probe_openrouter})
 
 @router.get("/ping")
-def ping():
-    return {"status": "ok"}
+async def ping():
+    # Cached probe results only; nothing here waits on the network
+    return {"status": "ok", "health": health_monitor.start().snapshot()}
+
+@router.get("/automation/status")
+def automation_status():
+    """State of the auto-DM daemon (scripts/auto_dm_full_cycle.py --daemon): interval, backlog, last cycle."""
+    try:
+        with open(AUTOMATION_STATUS_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"state": "not_running"}
+
+# --- Conditional GET: unchanged data costs a stat() and an empty 304 ---
+_bodies = {}  # name -> (etag, encoded body) for the latest version served
+
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or any(t.removeprefix("W/") == etag for t in tags)
+
+async def _conditional(name, version, if_none_match, encode):
+    """Serve ``encode()``'s JSON bytes under ETag ``name-version``, or 304 if the client has it."""
+    etag = f'"{name}-{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    cached = _bodies.get(name)
+    if cached is None or cached[0] != etag:
+        cached = _bodies[name] = (etag, await encode())
+    return Response(content=cached[1], media_type="application/json", headers=headers)
 
 @router.get("/logs")
-def logs():
-    return get_logs()
+async def logs(if_none_match: Optional[str] = Header(None)):
+    # Read and encode off the event loop; the log can be large
+    return await _conditional(
+        "logs", log_generation(), if_none_match,
+        lambda: run_log_io(lambda: json.dumps(get_logs()).encode()),
+    )
 
-@router.get("/stats")
-def stats():
+async def _log_backfill(after):
+    logs_data = await run_log_io(get_logs)
+    return logs_data[after:], len(logs_data)
+
+@router.get("/logs/stream")
+async def stream_logs(after: Optional[int] = None, last_event_id: Optional[str] = Header(None)):
+    """Server-sent "log" events for new entries: the entry, its seq (log position) and a stats delta.
+
+    Reconnects resume after Last-Event-ID (or ``after``); without either, only new entries are sent.
+    """
+    if last_event_id and last_event_id.isdigit():
+        after = int(last_event_id)
+    if after is None:
+        after = log_broadcaster.seq
+        if after is None:
+            after = len(await run_log_io(get_logs))
+
+    async def events():
+        async for event in log_broadcaster.follow(after, _log_backfill):
+            yield {"event": "log", "id": str(event.seq), "data": event.data}
+
+    return EventSourceResponse(events())
+
+def _stats(logs_data):
     """Calculate statistics from logs"""
-    logs_data = get_logs()
-    
     if not logs_data:
         return {
             "totalMessages": 0,
@@ -67,10 +147,30 @@ def stats():
         "messagesByIntent": intent_counts
     }
 
+@router.get("/stats")
+async def stats(if_none_match: Optional[str] = Header(None)):
+    """Calculate statistics from logs (the scan runs on a log I/O thread, once per log version)"""
+    return await _conditional(
+        "stats", log_generation(), if_none_match,
+        lambda: run_log_io(lambda: json.dumps(_stats(get_logs())).encode()),
+    )
+
+_intents = (None, None, None)  # (taxonomy, content hash, body); a tags.json reload swaps the taxonomy object
+
 @router.get("/intents")
-def intents():
+async def intents(if_none_match: Optional[str] = Header(None)):
     """Get all available intent categories with descriptions"""
-    return get_intent_categories()
+    global _intents
+    taxonomy = get_taxonomy()
+    if _intents[0] is not taxonomy:
+        body = json.dumps(taxonomy.categories()).encode()
+        _intents = (taxonomy, hashlib.sha256(body).hexdigest()[:16], body)
+    body = _intents[2]
+
+    async def encode():
+        return body
+
+    return await _conditional("intents", _intents[1], if_none_match, encode)
 
 @router.get('/prompt')
 def get_prompt():
@@ -87,119 +187,151 @@ def set_prompt(data: dict):
         f.write(prompt)
     return {'success': True, 'prompt': prompt}
 
-@router.post("/process_messages", response_model=List[ProcessedMessageModel])
-def process_messages(messages: List[MessageModel]):
-    processed = []
-    for msg in messages:
-        # Load custom prompt if present
-        try:
-            with open(PROMPT_FILE, 'r', encoding='utf-8') as f:
-                custom_prompt = f.read().strip()
-            if custom_prompt:
-                system_prompt = custom_prompt
-        except Exception:
-            pass
-        # 1. Classify intent using enhanced classification
-        intent = classify_intent(msg.text)
-        # 2. Try LLM suggestion
+def _parse_reply(llm_response):
+    # Strategy 1: Look for "Reply:" format
+    reply_match = re.search(r'Reply:\s*(.+)', llm_response, re.IGNORECASE | re.DOTALL)
+    if reply_match:
+        return reply_match.group(1).strip()
+    # Strategy 2: Look for text after "Intent:" line
+    lines = llm_response.strip().split('\n')
+    reply_lines = []
+    found_intent = False
+    for line in lines:
+        if line.lower().startswith('intent:'):
+            found_intent = True
+        elif found_intent and line.strip():
+            reply_lines.append(line)
+    return ' '.join(reply_lines).strip() if reply_lines else llm_response.strip()
+
+async def _process_message(msg: MessageModel):
+    # 1. Classify intent using enhanced classification
+    intent = classify_intent(msg.text)
+    # 2. Try LLM suggestion
+    suggestion = None
+    used_template = False
+    try:
+        system_prompt = (
+            "You are an Instagram DM assistant. Analyze the following message and respond appropriately.\n"
+            "INSTRUCTIONS:\n"
+            "1. Classify the intent of the message into one of these categories:\n"
+            + get_taxonomy().prompt_lines() +
+            "2. Provide a helpful, friendly, and professional response in context\n"
+            "3. Keep responses concise but warm\n"
+            "4. If it's a pricing question, mention starting at $99/month\n"
+            "5. If it's a greeting, be welcoming and ask how you can help\n"
+            "6. If it's a support request, be empathetic and offer assistance\n"
+            "7. If it's a sales lead, be enthusiastic and provide next steps\n"
+            "8. If it's a complaint, be apologetic and offer solutions\n"
+            "9. If it's an appointment request, offer scheduling options\n"
+            "10. If it's feedback, thank them and ask for more details\n"
+            "11. If it's a partnership inquiry, show interest and ask for details\n"
+            "RESPONSE FORMAT:\nIntent: [classified_intent]\nReply: [your_response]"
+        )
+        messages_llm = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": msg.text}
+        ]
+        llm_response = await openrouter_chat_completion_async(messages_llm)
+        if not isinstance(llm_response, str):
+            llm_response = str(llm_response) if llm_response is not None else ""
+        # Try to parse LLM response
+        suggestion = _parse_reply(llm_response) if llm_response else ""
+    except Exception:
         suggestion = None
-        used_template = False
-        try:
-            system_prompt = (
-                "You are an Instagram DM assistant. Analyze the following message and respond appropriately.\n"
-                "INSTRUCTIONS:\n"
-                "1. Classify the intent of the message into one of these categories:\n"
-                "   - greeting: Initial contact, hellos, introductions\n"
-                "   - pricing_inquiry: Questions about costs, rates, pricing\n"
-                "   - support_request: Help requests, technical issues, problems\n"
-                "   - sales_lead: Purchase interest, buying intent, orders\n"
-                "   - complaint: Negative feedback, complaints, dissatisfaction\n"
-                "   - spam: Unwanted messages, unsubscribe requests\n"
-                "   - appointment: Scheduling requests, bookings, meetings\n"
-                "   - feedback: Reviews, ratings, suggestions, opinions\n"
-                "   - partnership: Business opportunities, collaborations, deals\n"
-                "   - general_inquiry: General questions, information requests\n"
-                "   - other: Miscellaneous messages, unclear intent\n"
-                "2. Provide a helpful, friendly, and professional response in context\n"
-                "3. Keep responses concise but warm\n"
-                "4. If it's a pricing question, mention starting at $99/month\n"
-                "5. If it's a greeting, be welcoming and ask how you can help\n"
-                "6. If it's a support request, be empathetic and offer assistance\n"
-                "7. If it's a sales lead, be enthusiastic and provide next steps\n"
-                "8. If it's a complaint, be apologetic and offer solutions\n"
-                "9. If it's an appointment request, offer scheduling options\n"
-                "10. If it's feedback, thank them and ask for more details\n"
-                "11. If it's a partnership inquiry, show interest and ask for details\n"
-                "RESPONSE FORMAT:\nIntent: [classified_intent]\nReply: [your_response]"
-            )
-            messages_llm = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": msg.text}
-            ]
-            llm_response = openrouter_chat_completion(messages_llm)
-            if not isinstance(llm_response, str):
-                llm_response = str(llm_response) if llm_response is not None else ""
-            # Try to parse LLM response
-            if llm_response:
-                # Strategy 1: Look for "Reply:" format
-                reply_match = re.search(r'Reply:\s*(.+)', llm_response, re.IGNORECASE | re.DOTALL)
-                if reply_match:
-                    suggestion = reply_match.group(1).strip()
-                else:
-                    # Strategy 2: Look for text after "Intent:" line
-                    lines = llm_response.strip().split('\n')
-                    reply_lines = []
-                    found_intent = False
-                    for line in lines:
-                        if line.lower().startswith('intent:'):
-                            found_intent = True
-                        elif found_intent and line.strip():
-                            reply_lines.append(line)
-                    suggestion = ' '.join(reply_lines).strip() if reply_lines else llm_response.strip()
-            else:
-                suggestion = ""
-        except Exception:
-            suggestion = None
-        # 3. Fallback to simple response if LLM fails
-        if not suggestion or suggestion.startswith("["):
-            suggestion = "Thank you for your message! I'm here to help. How can I assist you today?"
-            used_template = True
-        # 4. Log
-        log_entry = {
-            "timestamp": datetime.utcnow().isoformat(),
-            "id": msg.id,
-            "thread_id": msg.thread_id,
-            "username": msg.from_user,
-            "original_message": msg.text,
-            "intent": intent,
-            "suggestion": suggestion,
-            "used_template": used_template,
-            "outcome": "responded",  # Default outcome
-        }
-        add_log_entry(log_entry)
-        processed.append(ProcessedMessageModel(
-            id=msg.id,
-            thread_id=msg.thread_id,
-            from_user=msg.from_user,
-            text=msg.text,
-            timestamp=msg.timestamp,
-            intent=intent,
-            suggestion=suggestion,
-            used_template=used_template
-        ))
-    return processed
+    # 3. Fallback to simple response if LLM fails
+    if not suggestion or suggestion.startswith("["):
+        suggestion = "Thank you for your message! I'm here to help. How can I assist you today?"
+        used_template = True
+    # 4. Log
+    log_entry = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "id": msg.id,
+        "thread_id": msg.thread_id,
+        "username": msg.from_user,
+        "original_message": msg.text,
+        "intent": intent,
+        "suggestion": suggestion,
+        "used_template": used_template,
+        "outcome": "responded",  # Default outcome
+    }
+    processed = ProcessedMessageModel(
+        id=msg.id,
+        thread_id=msg.thread_id,
+        from_user=msg.from_user,
+        text=msg.text,
+        timestamp=msg.timestamp,
+        intent=intent,
+        suggestion=suggestion,
+        used_template=used_template
+    )
+    return log_entry, processed
+
+@router.post("/process_messages", response_model=List[ProcessedMessageModel])
+async def process_messages(messages: List[MessageModel]):
+    # A batch's LLM calls run concurrently (bounded by LLM_MAX_CONCURRENCY across
+    # all requests); results and log entries keep the input order
+    results = await asyncio.gather(*(_process_message(msg) for msg in messages))
+    if results:
+        await aadd_log_entries([log_entry for log_entry, _ in results])
+    return [processed for _, processed in results]
 
 @router.get("/thread/{thread_id}/messages")
-def get_thread_messages(thread_id: str):
+async def get_thread_messages(thread_id: str):
     """
     Fetch all messages for a given thread_id using MCP tool.
     """
     try:
-        cmd = [sys.executable, "src/mcp_server.py", "--tool", "list_messages", "--thread_id", thread_id]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-        if result.returncode != 0:
-            return {"success": False, "error": result.stderr}
-        data = json.loads(result.stdout)
-        return data
+        return await get_tool_client().acall("list_messages", thread_id=thread_id)
     except Exception as e:
-        return {"success": False, "error": str(e)}
\ No newline at end of file
+        return {"success": False, "error": str(e)}
+
+# --- Background jobs: large batches without holding the request open ---
+async def _run_job_item(item):
+    log_entry, processed = await _process_message(MessageModel(**item))
+    await aadd_log_entries([log_entry])
+    return processed.model_dump()
+
+job_manager = JobManager(_run_job_item)
+
+def _get_job(job_id, after=0):
+    try:
+        return job_manager.get(job_id, after)
+    except JobNotFound:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+@router.post("/jobs", status_code=202)
+async def submit_job(request: JobRequestModel):
+    """Queue messages for processing; returns the job id at once. Higher priority runs first."""
+    return await job_manager.submit([msg.model_dump() for msg in request.messages], request.priority)
+
+@router.get("/jobs")
+async def list_jobs():
+    return job_manager.list()
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, after: int = 0):
+    """Job status plus results finished since position ``after`` (pass back the last ``seq`` + 1 to page)."""
+    return _get_job(job_id, after)
+
+@router.get("/jobs/{job_id}/stream")
+async def stream_job(job_id: str, after: int = 0, last_event_id: Optional[str] = Header(None)):
+    """Server-sent events: one "result" per finished item, then a final "status"; resumes from Last-Event-ID."""
+    _get_job(job_id)
+    if last_event_id and last_event_id.isdigit():
+        after = int(last_event_id)
+
+    async def events():
+        async for kind, payload in job_manager.follow(job_id, after):
+            event = {"event": kind, "data": json.dumps(payload)}
+            if kind == "result":
+                event["id"] = str(payload["seq"] + 1)
+            yield event
+
+    return EventSourceResponse(events())
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    try:
+        return await job_manager.cancel(job_id)
+    except JobNotFound:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
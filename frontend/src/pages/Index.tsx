@@ -53,16 +53,28 @@ const Index = () => {
   const [promptEdit, setPromptEdit] = useState('');
   const promptRef = useRef<HTMLTextAreaElement>(null);
 
-  // Load initial data
+  // Load initial data, then follow new log entries pushed by the backend
   useEffect(() => {
-    loadDashboardData();
-    
-    // Poll stats every 30 seconds
-    const interval = setInterval(loadStats, 30000);
-    return () => clearInterval(interval);
+    let events: EventSource | null = null;
+    let closed = false;
+    loadDashboardData().then(total => {
+      if (closed) return;
+      // Start right after the entries the stats already count; reconnects resume via Last-Event-ID
+      events = new EventSource(total != null ? `/api/logs/stream?after=${total}` : '/api/logs/stream');
+      events.addEventListener('log', (event) => {
+        const { seq, entry, stats: delta } = JSON.parse((event as MessageEvent).data);
+        setStats(prev => prev && applyStatsDelta(prev, delta));
+        // seq is the entry's position in the log; only extend a list that is already up to date
+        setLogs(prev => (prev.length === seq - 1 ? [...prev, entry] : prev));
+      });
+    });
+    return () => {
+      closed = true;
+      events?.close();
+    };
   }, []);
 
-  const loadDashboardData = async () => {
+  const loadDashboardData = async (): Promise<number | null> => {
     try {
       setLoading(true);
       setError(null);
@@ -73,23 +85,26 @@ const Index = () => {
       ]);
       
       setStats(statsRes);
+      return statsRes.totalMessages;
     } catch (error) {
       console.error('Error loading dashboard data:', error);
       setError('Failed to load dashboard data');
+      return null;
     } finally {
       setLoading(false);
     }
   };
 
-  const loadStats = async () => {
-    try {
-      const response = await fetch('/api/stats');
-      const newStats = await response.json();
-      setStats(newStats);
-      console.log('Polling stats...');
-    } catch (error) {
-      console.error('Error polling stats:', error);
+  const applyStatsDelta = (current: Stats, delta: Pick<Stats, 'totalMessages' | 'messagesByIntent'>): Stats => {
+    const messagesByIntent = { ...current.messagesByIntent };
+    for (const [intent, count] of Object.entries(delta.messagesByIntent)) {
+      messagesByIntent[intent] = (messagesByIntent[intent] || 0) + count;
     }
+    return {
+      ...current,
+      totalMessages: current.totalMessages + delta.totalMessages,
+      messagesByIntent,
+    };
   };
 
   const loadLogs = async () => {
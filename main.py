@@ -1,7 +1,8 @@
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from api.routes import router
+from api.routes import router, job_manager
+from utils.mcp_client import aclose_http
 
 app = FastAPI(title="AI-Powered DM Automation", version="1.0.0")
 
@@ -14,5 +15,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def start_jobs():
+    # Resume jobs left queued or running by the last shutdown
+    await job_manager.start()
+
+@app.on_event("shutdown")
+async def shut_down():
+    await job_manager.stop()
+    await aclose_http()
+
 app.include_router(router, prefix="/api")
 app.mount("/", StaticFiles(directory="frontend", html=True), name="frontend")
\ No newline at end of file
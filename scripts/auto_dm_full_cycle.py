@@ -1,103 +1,412 @@
+import argparse
+import json
+import os
+import queue
 import requests
-import subprocess
+import signal
 import sys
-import json
+import threading
 import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.outbox import Outbox, outbox_key
+from utils.tool_client import get_tool_client
 
 BACKEND_URL = "http://localhost:8000/api/process_messages"
-MCP_SERVER_CMD = [sys.executable, "src/mcp_server.py"]
+# Tools run in the long-lived MCP worker; it is started on first use if needed
+tools = get_tool_client()
+
+# Per-stage concurrency and the size of the queues between stages
+FETCH_WORKERS = int(os.getenv("AUTO_DM_FETCH_WORKERS", "4"))
+REPLY_WORKERS = int(os.getenv("AUTO_DM_REPLY_WORKERS", "4"))
+SEND_WORKERS = int(os.getenv("AUTO_DM_SEND_WORKERS", "2"))
+QUEUE_SIZE = int(os.getenv("AUTO_DM_QUEUE_SIZE", "32"))
+
+# Threads taken from the inbox per cycle
+THREAD_BATCH = int(os.getenv("AUTO_DM_THREAD_BATCH", "20"))
+
+# Daemon polling: back off from MIN to MAX seconds while idle, reset on activity
+MIN_INTERVAL = float(os.getenv("AUTO_DM_MIN_INTERVAL", "5"))
+MAX_INTERVAL = float(os.getenv("AUTO_DM_MAX_INTERVAL", "300"))
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+# Last handled message per thread, so reruns only see what is newer
+WATERMARKS_FILE = DATA_DIR / "auto_dm_watermarks.json"
+# Inbox position of the automation and threads to retry, advanced only after processing
+INBOX_STATE_FILE = DATA_DIR / "auto_dm_inbox.json"
+# Daemon state for monitoring (also served at /api/automation/status)
+STATUS_FILE = DATA_DIR / "auto_dm_status.json"
+
+# Backend connections are kept alive between calls
+http = requests.Session()
+
+# Generated replies are stored here before sending and survive restarts
+outbox = Outbox()
 
-# --- List all threads using MCP tool ---
-def list_all_threads():
+# --- Per-thread watermarks ---
+def _load_watermarks():
     try:
-        cmd = MCP_SERVER_CMD + ["--tool", "list_chats"]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-        if result.returncode != 0:
-            print(f"[ERROR] MCP list_chats failed: {result.stderr}")
-            return []
-        data = json.loads(result.stdout)
+        with open(WATERMARKS_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+_watermarks = _load_watermarks()
+_watermarks_lock = threading.Lock()
+
+def get_watermark(thread_id):
+    return _watermarks.get(str(thread_id))
+
+def set_watermark(thread_id, message_id, timestamp=None):
+    """Record ``message_id`` as handled in ``thread_id`` and persist atomically."""
+    with _watermarks_lock:
+        _watermarks[str(thread_id)] = {"message_id": str(message_id), "timestamp": timestamp}
+        WATERMARKS_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp = WATERMARKS_FILE.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(_watermarks, f)
+        os.replace(tmp, WATERMARKS_FILE)
+
+# --- Inbox cursor: where the last processed listing ended, plus threads that failed ---
+def load_inbox_state():
+    try:
+        with open(INBOX_STATE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"watermark": None, "retry": []}
+
+def save_inbox_state(state):
+    INBOX_STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = INBOX_STATE_FILE.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, INBOX_STATE_FILE)
+
+# --- List threads with activity since the last run using MCP tool ---
+def list_all_threads(since=None):
+    """Return (thread ids active after ``since``, watermark covering them).
+
+    Without a watermark (first run) the newest THREAD_BATCH threads are
+    listed. The watermark is only saved by ``finish_cycle``, after the
+    threads went through the pipeline.
+    """
+    try:
+        data = tools.call("list_chats", since=since or "0", amount=THREAD_BATCH)
         if not data.get("success"):
             print(f"[ERROR] MCP list_chats: {data.get('message')}")
-            return []
+            return [], since
         threads = data.get("threads", [])
         thread_ids = [t.get("thread_id") for t in threads if t.get("thread_id")]
-        return thread_ids
+        return thread_ids, data.get("watermark") or since
     except Exception as e:
         print(f"[ERROR] Exception in list_all_threads: {e}")
-        return []
+        return [], since
+
+def start_cycle(state):
+    """Threads for this cycle: retries from the last one first, then newly active ones."""
+    listed, watermark = list_all_threads(state.get("watermark"))
+    retry = [t for t in state.get("retry", []) if t not in listed]
+    return retry + listed, listed, watermark
+
+def finish_cycle(state, thread_ids, watermark, processed):
+    """Advance the cursor and keep threads that didn't get through for the next cycle."""
+    state = {"watermark": watermark, "retry": [t for t in thread_ids if t not in processed]}
+    save_inbox_state(state)
+    if state["retry"]:
+        print(f"[WARN] {len(state['retry'])} thread(s) will be retried next cycle.")
+    return state
+
+# --- Fetch messages after the thread's watermark ---
+# Messages per list_messages call; a thread's whole backlog is read page by page
+MESSAGE_PAGE = 20
 
-# --- Fetch new/unread messages for a thread ---
 def list_new_messages(thread_id):
+    """Return (incoming text messages to answer, oldest first; newest message seen or None).
+
+    The messages are None if the thread could not be fetched.
+    """
     try:
-        cmd = MCP_SERVER_CMD + ["--tool", "list_messages", "--thread_id", thread_id]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-        if result.returncode != 0:
-            print(f"[ERROR] MCP list_messages failed: {result.stderr}")
-            return []
-        data = json.loads(result.stdout)
-        if not data.get("success"):
-            print(f"[ERROR] MCP list_messages: {data.get('message')}")
-            return []
-        messages = data.get("messages", [])
+        watermark = get_watermark(thread_id)
+        since_id = watermark["message_id"] if watermark else None
+        messages = []  # newest first
+        while True:
+            data = tools.call("list_messages", thread_id=thread_id, amount=MESSAGE_PAGE, since_id=since_id)
+            if not data.get("success"):
+                print(f"[ERROR] MCP list_messages: {data.get('message')}")
+                return None, None
+            if data.get("since_id_found") is False:
+                # The watermarked message is gone (unsent); start over as if the thread were new
+                print(f"[WARN] Watermark of thread {thread_id} no longer exists; rescanning.")
+                watermark = since_id = None
+                messages = []
+                continue
+            page = data.get("messages", [])
+            messages = page + messages
+            # Pages after a watermark come oldest first; keep going until the thread is drained
+            if since_id is None or len(page) < MESSAGE_PAGE:
+                break
+            since_id = page[0]["id"]
+        newest = messages[0] if messages else None
+        if not watermark:
+            # First sight of this thread: only what came in after our last reply
+            for i, m in enumerate(messages):
+                if m.get("is_outgoing"):
+                    messages = messages[:i]
+                    break
         new_msgs = [
             {
                 "id": m.get("id"),
                 "thread_id": thread_id,
                 "from_user": m.get("username"),
-                "text": m.get("text")
+                "text": m.get("text"),
+                "timestamp": m.get("timestamp"),
             }
-            for m in messages if not m.get("seen", False)
+            for m in reversed(messages)
+            if not m.get("is_outgoing") and m.get("text") and m.get("username")
         ]
-        return new_msgs
+        return new_msgs, newest
     except Exception as e:
         print(f"[ERROR] Exception in list_new_messages: {e}")
-        return []
+        return None, None
 
-# --- Call backend to get AI reply suggestions ---
+# --- Call backend to get AI reply suggestions (None if the backend failed) ---
 def get_ai_replies(messages):
     try:
-        response = requests.post(BACKEND_URL, json=messages)
+        response = http.post(BACKEND_URL, json=messages)
         if response.status_code == 200:
             return response.json()
         else:
             print(f"[ERROR] Backend returned {response.status_code}: {response.text}")
-            return []
+            return None
     except Exception as e:
         print(f"[ERROR] Failed to contact backend: {e}")
-        return []
+        return None
 
 # --- Send reply using MCP tool ---
 def send_reply(username, reply):
+    """Send one DM; returns None on success or the error message."""
     try:
-        cmd = MCP_SERVER_CMD + ["--tool", "send_message", "--username", username, "--message", reply]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-        if result.returncode == 0:
+        data = tools.call("send_message", username=username, message=reply)
+        if data.get("success"):
             print(f"[MCP] Sent to {username}: {reply}")
-        else:
-            print(f"[ERROR] MCP send_message failed: {result.stderr}")
+            return None
+        error = data.get("message") or "send_message failed"
+        print(f"[ERROR] MCP send_message failed: {error}")
     except Exception as e:
+        error = str(e)
         print(f"[ERROR] Exception in send_reply: {e}")
+    return error
 
-# --- Main full-cycle automation ---
-def main():
-    thread_ids = list_all_threads()
-    if not thread_ids:
-        print("No threads found.")
-        return
-    for thread_id in thread_ids:
-        messages = list_new_messages(thread_id)
-        if not messages:
-            print(f"No new messages to process in thread {thread_id}.")
-            continue
-        ai_replies = get_ai_replies(messages)
-        for reply_obj in ai_replies:
+def is_handled(entry):
+    """True if the thread's watermark is already at or past this reply's message."""
+    watermark = get_watermark(entry["thread_id"])
+    if not watermark:
+        return False
+    if watermark["message_id"] == str(entry["message_id"]):
+        return True
+    return bool(entry.get("timestamp") and watermark.get("timestamp") and entry["timestamp"] <= watermark["timestamp"])
+
+def deliver(entry):
+    print(f"Auto-replying to {entry['username']}: {entry['text']}")
+    error = send_reply(entry["username"], entry["text"])
+    if error is None:
+        set_watermark(entry["thread_id"], entry["message_id"], entry.get("timestamp"))
+    return error
+
+# --- Pipeline stages: each takes one item and returns the items for the next stage ---
+# Threads that made it through fetch and reply generation in the running cycle;
+# the rest are retried next cycle
+_processed = set()
+
+def fetch_stage(thread_id):
+    messages, newest = list_new_messages(thread_id)
+    if messages is None:
+        return []
+    if not messages:
+        print(f"No new messages to process in thread {thread_id}.")
+        # Nothing to answer (our own or non-text messages): skip past them next time
+        if newest:
+            set_watermark(thread_id, newest["id"], newest.get("timestamp"))
+        _processed.add(thread_id)
+        return []
+    # Replies already generated are waiting in the outbox; don't pay for them twice
+    fresh = [m for m in messages if outbox_key(thread_id, m["id"]) not in outbox]
+    return [(thread_id, fresh)]
+
+def reply_stage(batch):
+    thread_id, messages = batch
+    if messages:
+        # One backend call per thread keeps its replies in message order
+        generated = get_ai_replies(messages)
+        if generated is None:
+            return []
+        replies = []
+        for reply_obj in generated:
             username = reply_obj.get("from_user")
             reply = reply_obj.get("suggestion")
             if username and reply:
-                print(f"Auto-replying to {username}: {reply}")
-                send_reply(username, reply)
+                replies.append({
+                    "message_id": reply_obj.get("id"), "timestamp": reply_obj.get("timestamp"),
+                    "username": username, "text": reply,
+                })
             else:
                 print(f"[WARN] Missing username or reply in: {reply_obj}")
+        outbox.enqueue(thread_id, replies)
+    _processed.add(thread_id)
+    return [thread_id]
+
+def send_stage(thread_id):
+    # Sequential within a thread; other threads are drained by other workers
+    outbox.drain(thread_id, deliver, is_handled)
+    return []
+
+_STOP = object()
+
+def _start_stage(name, work, source, sink, workers):
+    def run():
+        while True:
+            item = source.get()
+            if item is _STOP:
+                return
+            try:
+                for out in work(item):
+                    sink.put(out)
+            except Exception as e:
+                print(f"[ERROR] {name} stage: {e}")
+    threads = [threading.Thread(target=run, name=f"{name}-{i}", daemon=True) for i in range(workers)]
+    for t in threads:
+        t.start()
+    return threads
+
+def run_pipeline(thread_ids):
+    """Fetch messages -> generate replies -> send, with threads flowing through in parallel.
+
+    Stages are connected by bounded queues, so a slow stage holds back the
+    ones before it instead of buffering the whole inbox. Returns the threads
+    whose replies were generated (or that had nothing to answer).
+    """
+    _processed.clear()
+    queues = [queue.Queue(maxsize=QUEUE_SIZE) for _ in range(4)]
+    _active_queues[:] = queues
+    stages = [
+        ("fetch", fetch_stage, FETCH_WORKERS),
+        ("reply", reply_stage, REPLY_WORKERS),
+        ("send", send_stage, SEND_WORKERS),
+    ]
+    running = [
+        _start_stage(name, work, queues[i], queues[i + 1], workers)
+        for i, (name, work, workers) in enumerate(stages)
+    ]
+    # Replies left over from an earlier run (crash, rate limit) go straight to sending
+    for thread_id in outbox.pending_threads():
+        if thread_id not in thread_ids:
+            queues[2].put(thread_id)
+    for thread_id in thread_ids:
+        queues[0].put(thread_id)
+    # Drain stage by stage: once a stage's workers exit, nothing more reaches the next
+    for i, threads in enumerate(running):
+        for _ in threads:
+            queues[i].put(_STOP)
+        for t in threads:
+            t.join()
+    _active_queues.clear()
+    outbox.flush()
+    return set(_processed)
+
+# Queues of the pipeline currently running, for backlog reporting
+_active_queues = []
+
+# --- Daemon mode ---
+def next_interval(interval, thread_count):
+    """Poll again at once if the batch was full, soon after activity, and back off while idle.
+
+    A reply waiting for a retry caps the wait at when it is due.
+    """
+    if thread_count >= THREAD_BATCH:
+        return 0.0
+    interval = MIN_INTERVAL if thread_count else min(MAX_INTERVAL, max(interval, MIN_INTERVAL) * 2)
+    retry_in = outbox.next_due_in()
+    return interval if retry_in is None else min(interval, max(retry_in, MIN_INTERVAL))
+
+_status_lock = threading.Lock()
+
+def _write_status(status):
+    """Best effort: a failed status write is reported, never fatal to the daemon."""
+    status = dict(
+        status, backlog=sum(q.qsize() for q in list(_active_queues)),
+        outbox=outbox.stats(), updated_at=datetime.utcnow().isoformat(),
+    )
+    # The reporter thread and the main loop both write; one temp file, one writer at a time
+    with _status_lock:
+        try:
+            STATUS_FILE.parent.mkdir(parents=True, exist_ok=True)
+            tmp = STATUS_FILE.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(status, f)
+            os.replace(tmp, STATUS_FILE)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"[WARN] Could not write status: {e}")
+
+def run_daemon():
+    """Poll and process until SIGTERM/SIGINT, keeping the tool worker and HTTP connections warm.
+
+    A signal lets the running cycle finish (its replies are sent and
+    watermarked) and then exits instead of sleeping again.
+    """
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        print("Shutdown requested; finishing the current cycle.")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    status = {"state": "starting", "pid": os.getpid(), "interval": MIN_INTERVAL, "cycles": 0, "last_cycle": None}
+
+    def report():
+        while not stop.wait(5):
+            _write_status(status)
+
+    threading.Thread(target=report, name="status", daemon=True).start()
+    interval = MIN_INTERVAL
+    state = load_inbox_state()
+    while not stop.is_set():
+        status["state"] = "running"
+        _write_status(status)
+        started = time.monotonic()
+        thread_ids, listed, watermark = start_cycle(state)
+        processed = run_pipeline(thread_ids) if thread_ids or outbox.pending_threads() else set()
+        state = finish_cycle(state, thread_ids, watermark, processed)
+        # Retries alone don't count as activity, or a down backend would be polled in a tight loop
+        interval = next_interval(interval, len(listed))
+        status.update(
+            state="sleeping", interval=interval, cycles=status["cycles"] + 1,
+            last_cycle={"threads": len(thread_ids), "seconds": round(time.monotonic() - started, 2), "finished_at": datetime.utcnow().isoformat()},
+        )
+        _write_status(status)
+        print(f"Cycle done: {len(thread_ids)} thread(s); next poll in {interval:.1f}s.")
+        stop.wait(interval)
+    status["state"] = "stopped"
+    _write_status(status)
+
+# --- Main full-cycle automation ---
+def main():
+    parser = argparse.ArgumentParser(description="Reply to new Instagram DMs through the backend.")
+    parser.add_argument("--daemon", action="store_true", help="Keep running, polling at an adaptive interval")
+    args = parser.parse_args()
+    if args.daemon:
+        run_daemon()
+        return
+    state = load_inbox_state()
+    thread_ids, _, watermark = start_cycle(state)
+    if not thread_ids and not outbox.pending_threads():
+        print("No threads found.")
+        finish_cycle(state, thread_ids, watermark, set())
+        return
+    finish_cycle(state, thread_ids, watermark, run_pipeline(thread_ids))
     print("Done. Stats and logs are updated by the backend automatically.")
 
 if __name__ == "__main__":
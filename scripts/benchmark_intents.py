@@ -0,0 +1,178 @@
+"""
+Offline benchmark for intent classification.
+
+Runs one or more classifier implementations over a labelled corpus and
+reports throughput, per-message latency percentiles, per-intent
+precision/recall and the most common intent confusions.
+
+Usage:
+    python scripts/benchmark_intents.py
+    python scripts/benchmark_intents.py --impl utils.mcp_client:classify_intent --impl mymod:classify
+    python scripts/benchmark_intents.py --seed data/logs.json requests.jsonl
+"""
+import argparse
+import importlib
+import json
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+DEFAULT_CORPUS = ROOT / "data" / "intent_corpus.jsonl"
+DEFAULT_IMPL = "utils.mcp_client:classify_intent"
+TEXT_KEYS = ("text", "original_message", "message")
+
+# --- Corpus helpers ---
+def load_corpus(path):
+    """Load corpus records ({"text", "intent"}); intent may be null for unlabelled rows."""
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    return records
+
+def _iter_recorded_texts(path):
+    """Yield message texts from a JSON array (data/logs.json) or a JSONL file."""
+    with open(path, "r", encoding="utf-8") as f:
+        raw = f.read()
+    try:
+        items = json.loads(raw)
+        if isinstance(items, dict):
+            items = [items]
+    except json.JSONDecodeError:
+        items = [json.loads(line) for line in raw.splitlines() if line.strip()]
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        for key in TEXT_KEYS:
+            if isinstance(item.get(key), str) and item[key].strip():
+                yield item[key].strip()
+                break
+
+def seed_corpus(corpus_path, sources):
+    """Append unseen texts from recorded traffic as unlabelled corpus rows."""
+    existing = load_corpus(corpus_path) if Path(corpus_path).exists() else []
+    seen = {r["text"] for r in existing}
+    added = 0
+    with open(corpus_path, "a", encoding="utf-8") as f:
+        for source in sources:
+            for text in _iter_recorded_texts(source):
+                if text in seen:
+                    continue
+                seen.add(text)
+                f.write(json.dumps({"text": text, "intent": None, "source": Path(source).name}, ensure_ascii=False) + "\n")
+                added += 1
+    print(f"Added {added} unlabelled messages to {corpus_path}; set their \"intent\" to include them in accuracy.")
+
+def load_impl(spec):
+    module_name, _, func_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), func_name or "classify_intent")
+
+# --- Measurement ---
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+def run_benchmark(classify, records, repeat=200, warmup=1):
+    texts = [r["text"] for r in records]
+    for _ in range(warmup):
+        for text in texts:
+            classify(text)
+
+    latencies = []
+    perf = time.perf_counter
+    start = perf()
+    for _ in range(repeat):
+        for text in texts:
+            t0 = perf()
+            classify(text)
+            latencies.append(perf() - t0)
+    elapsed = perf() - start
+    latencies.sort()
+
+    labelled = [r for r in records if r.get("intent")]
+    predictions = [(r["intent"], classify(r["text"])) for r in labelled]
+    return {
+        "messages": len(latencies),
+        "messages_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_us": {
+            "p50": percentile(latencies, 50) * 1e6,
+            "p90": percentile(latencies, 90) * 1e6,
+            "p99": percentile(latencies, 99) * 1e6,
+            "max": latencies[-1] * 1e6 if latencies else 0.0,
+        },
+        "accuracy": _accuracy(predictions),
+    }
+
+def _accuracy(predictions):
+    confusion = Counter(predictions)
+    intents = sorted({i for pair in predictions for i in pair})
+    per_intent = {}
+    for intent in intents:
+        tp = confusion[(intent, intent)]
+        predicted = sum(n for (_, p), n in confusion.items() if p == intent)
+        actual = sum(n for (a, _), n in confusion.items() if a == intent)
+        precision = tp / predicted if predicted else 0.0
+        recall = tp / actual if actual else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        per_intent[intent] = {"precision": precision, "recall": recall, "f1": f1, "support": actual}
+    correct = sum(n for (a, p), n in confusion.items() if a == p)
+    return {
+        "labelled": len(predictions),
+        "overall": correct / len(predictions) if predictions else 0.0,
+        "per_intent": per_intent,
+        "confusion": [
+            {"expected": a, "predicted": p, "count": n}
+            for (a, p), n in confusion.most_common() if a != p
+        ],
+    }
+
+# --- Reporting ---
+def print_report(name, result):
+    print(f"\n=== {name} ===")
+    lat = result["latency_us"]
+    print(f"{result['messages']} classifications, {result['messages_per_second']:,.0f} msg/s")
+    print(f"latency us: p50={lat['p50']:.2f} p90={lat['p90']:.2f} p99={lat['p99']:.2f} max={lat['max']:.2f}")
+    acc = result["accuracy"]
+    print(f"accuracy: {acc['overall']:.1%} over {acc['labelled']} labelled messages")
+    print(f"{'intent':<18}{'precision':>10}{'recall':>8}{'f1':>8}{'support':>9}")
+    for intent, m in acc["per_intent"].items():
+        print(f"{intent:<18}{m['precision']:>10.2f}{m['recall']:>8.2f}{m['f1']:>8.2f}{m['support']:>9}")
+    if acc["confusion"]:
+        print("confusions (expected -> predicted):")
+        for c in acc["confusion"]:
+            print(f"  {c['expected']} -> {c['predicted']}: {c['count']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark intent classification offline.")
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS), help="Labelled JSONL corpus")
+    parser.add_argument("--impl", action="append", help="Classifier as module:function (repeatable)")
+    parser.add_argument("--repeat", type=int, default=200, help="Passes over the corpus for timing")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--seed", nargs="+", metavar="FILE", help="Append unlabelled texts from recorded traffic and exit")
+    args = parser.parse_args(argv)
+
+    if args.seed:
+        seed_corpus(args.corpus, args.seed)
+        return
+
+    records = load_corpus(args.corpus)
+    results = {}
+    for spec in args.impl or [DEFAULT_IMPL]:
+        results[spec] = run_benchmark(load_impl(spec), records, repeat=args.repeat)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for spec, result in results.items():
+            print_report(spec, result)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Replay recorded DM traffic through process_messages offline.
+
+Messages from data/logs.json (or any JSON array / JSONL file with a text
+field) are fed to the backend's classification -> LLM -> logging path in
+their recorded order, with the LLM and the Instagram send replaced by
+stubs of configurable latency. Log writes go to a temporary file, so the
+real logs are untouched. Reports throughput and latency percentiles.
+
+Usage:
+    python scripts/replay_traffic.py                       # data/logs.json, as fast as possible
+    python scripts/replay_traffic.py --speed original      # keep the recorded gaps
+    python scripts/replay_traffic.py --speed 60 --max-gap 5 --concurrency 16
+    python scripts/replay_traffic.py --llm-latency 0 --json
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from scripts.benchmark_intents import TEXT_KEYS, percentile
+
+DEFAULT_SOURCE = ROOT / "data" / "logs.json"
+
+# --- Recorded traffic ---
+def _parse_time(value):
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        return None
+
+def load_traffic(paths):
+    """Return recorded messages ({"id", "thread_id", "from_user", "text", "at"}) oldest first."""
+    records = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = f.read()
+        try:
+            items = json.loads(raw)
+            if isinstance(items, dict):
+                items = [items]
+        except json.JSONDecodeError:
+            items = [json.loads(line) for line in raw.splitlines() if line.strip()]
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            text = next((item[k] for k in TEXT_KEYS if isinstance(item.get(k), str) and item[k].strip()), None)
+            if text is None:
+                continue
+            records.append({
+                "id": str(item.get("id") or item.get("message_id") or len(records)),
+                "thread_id": str(item.get("thread_id") or "replay"),
+                "from_user": str(item.get("username") or item.get("from_user") or "replay_user"),
+                "text": text,
+                "at": _parse_time(item.get("timestamp")) if item.get("timestamp") else None,
+            })
+    # Untimed records keep file order after the timed ones before them
+    last = 0.0
+    for r in records:
+        r["at"] = last = r["at"] if r["at"] is not None else last
+    records.sort(key=lambda r: r["at"])
+    return records
+
+def schedule(records, speed, max_gap=None):
+    """Offsets in seconds from the start at which each record is replayed (all 0 for speed=None)."""
+    if speed is None:
+        return [0.0] * len(records)
+    offsets, elapsed, prev = [], 0.0, records[0]["at"] if records else 0.0
+    for r in records:
+        gap = r["at"] - prev
+        if max_gap is not None:
+            gap = min(gap, max_gap)
+        elapsed += gap / speed
+        offsets.append(elapsed)
+        prev = r["at"]
+    return offsets
+
+# --- Stubbed back ends ---
+def install_stubs(llm_latency, log_file):
+    """Point the backend at a stub LLM and a scratch log file."""
+    import api.routes as routes
+    import utils.mcp_client as mcp_client
+
+    async def fake_llm(messages, **kwargs):
+        await asyncio.sleep(llm_latency)
+        text = messages[-1]["content"]
+        return f"Intent: {mcp_client.classify_intent(text)}\nReply: Thanks for your message about \"{text[:40]}\"!"
+
+    routes.openrouter_chat_completion_async = fake_llm
+    mcp_client.LOG_FILE = Path(log_file)
+    return routes
+
+def fake_send(send_latency):
+    async def send(username, text):
+        await asyncio.sleep(send_latency)
+        return {"success": True}
+    return send
+
+# --- Replay ---
+async def _replay(routes, send, records, offsets, concurrency):
+    service, lag, errors = [], [], []
+    slots = asyncio.Semaphore(concurrency)
+    perf = time.perf_counter
+
+    async def handle(record, due):
+        async with slots:
+            t0 = perf()
+            try:
+                msg = routes.MessageModel(**{k: record[k] for k in ("id", "thread_id", "from_user", "text")})
+                for processed in await routes.process_messages([msg]):
+                    await send(processed.from_user, processed.suggestion)
+            except Exception as e:
+                errors.append(str(e))
+                return
+            done = perf()
+            service.append(done - t0)
+            lag.append(done - due)
+
+    start = perf()
+    tasks = []
+    for record, offset in zip(records, offsets):
+        delay = start + offset - perf()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(handle(record, start + offset)))
+    await asyncio.gather(*tasks)
+    return service, lag, errors, perf() - start
+
+def replay(records, speed=None, max_gap=None, concurrency=8, llm_latency=0.5, send_latency=0.0):
+    with tempfile.TemporaryDirectory() as tmp:
+        routes = install_stubs(llm_latency, Path(tmp) / "logs.json")
+        offsets = schedule(records, speed, max_gap)
+        service, lag, errors, elapsed = asyncio.run(
+            _replay(routes, fake_send(send_latency), records, offsets, concurrency)
+        )
+        with open(Path(tmp) / "logs.json", "r", encoding="utf-8") as f:
+            logged = len(json.load(f))
+
+    service.sort()
+    lag.sort()
+    return {
+        "messages": len(records),
+        "processed": len(service),
+        "errors": len(errors),
+        "logged": logged,
+        "seconds": elapsed,
+        "messages_per_second": len(service) / elapsed if elapsed else 0.0,
+        "service_ms": {p: percentile(service, n) * 1e3 for p, n in (("p50", 50), ("p90", 90), ("p99", 99))},
+        "end_to_end_ms": {p: percentile(lag, n) * 1e3 for p, n in (("p50", 50), ("p90", 90), ("p99", 99))},
+        "first_errors": errors[:5],
+    }
+
+def print_report(result):
+    print(f"{result['processed']}/{result['messages']} messages in {result['seconds']:.2f}s "
+          f"({result['messages_per_second']:,.1f} msg/s), {result['errors']} errors, {result['logged']} logged")
+    s, e = result["service_ms"], result["end_to_end_ms"]
+    print(f"service ms:     p50={s['p50']:.1f} p90={s['p90']:.1f} p99={s['p99']:.1f}")
+    print(f"end-to-end ms:  p50={e['p50']:.1f} p90={e['p90']:.1f} p99={e['p99']:.1f}  (includes waiting for a slot)")
+    for error in result["first_errors"]:
+        print(f"  error: {error}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded DMs through process_messages with stubbed back ends.")
+    parser.add_argument("sources", nargs="*", default=[str(DEFAULT_SOURCE)], help="Recorded traffic (JSON array or JSONL)")
+    parser.add_argument("--speed", default="max", help="'original', a speed-up factor such as 10, or 'max' (default)")
+    parser.add_argument("--max-gap", type=float, help="Cap recorded gaps between messages at this many seconds")
+    parser.add_argument("--concurrency", type=int, default=8, help="Messages processed at once")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Stub LLM delay in seconds")
+    parser.add_argument("--send-latency", type=float, default=0.0, help="Stub Instagram send delay in seconds")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay the traffic this many times back to back")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    speed = None if args.speed == "max" else 1.0 if args.speed == "original" else float(args.speed)
+    records = load_traffic(args.sources)
+    if not records:
+        print("No recorded messages found.")
+        return
+    if args.repeat > 1:
+        span = records[-1]["at"] - records[0]["at"] + 1
+        records = [dict(r, at=r["at"] + i * span) for i in range(args.repeat) for r in records]
+
+    result = replay(records, speed, args.max_gap, args.concurrency, args.llm_latency, args.send_latency)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,7 @@ client = Client()
 client = Client()
 
 # Check if existing session is valid
-session_file = Path("instagrapi_settings.json")
+session_file = Path(os.getenv("INSTAGRAM_SETTINGS_FILE", "instagrapi_settings.json"))
 if session_file.exists():
     try:
         client.load_settings(session_file)
@@ -28,8 +28,8 @@ if session_file.exists():
 try:
     client.login(username, password)
     print("Login successful!")
-    client.dump_settings(Path("instagrapi_settings.json"))
-    print("Session saved to instagrapi_settings.json")
+    client.dump_settings(session_file)
+    print(f"Session saved to {session_file}")
 except Exception as e:
     print(f"Login failed: {e}")
     exit(1)
\ No newline at end of file
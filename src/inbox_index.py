@@ -0,0 +1,99 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+DEFAULT_INDEX_FILE = Path("data") / "inbox_activity.json"
+PAGE_SIZE = 20
+
+
+class InboxActivityIndex:
+    """Delta listing of the inbox: only threads active since a persisted watermark.
+
+    Activity is Instagram's raw ``last_activity_at`` in microseconds, and a
+    watermark is an activity value, passed around as a string. The inbox is
+    ordered by activity, so a delta listing pages from the newest thread and
+    stops at the first page that reaches back past the watermark: polling
+    costs one request per page of changed threads, not per page of inbox.
+    Listing never moves the saved watermark; callers that resume from it
+    advance it with ``save_watermark`` once they are done with the threads.
+    """
+
+    def __init__(self, client, path=None):
+        self.client = client
+        self.path = Path(path or os.getenv("INBOX_INDEX_FILE", DEFAULT_INDEX_FILE))
+        self._lock = threading.Lock()
+        self._saved = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if "saved" not in data:
+            # Older files were the bare thread id -> activity map, saved watermark implied by its max
+            return max(data.values(), default=0)
+        return data["saved"]
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"saved": self._saved}, f)
+        os.replace(tmp, self.path)
+
+    @property
+    def watermark(self):
+        """The saved watermark; delta listings resume from it with ``since="saved"``."""
+        with self._lock:
+            return str(self._saved)
+
+    def save_watermark(self, watermark):
+        """Move the saved watermark forward (never back) to ``watermark``."""
+        with self._lock:
+            if int(watermark) > self._saved:
+                self._saved = int(watermark)
+                self._save()
+
+    def _fetch_page(self, box, thread_message_limit, cursor):
+        params = {
+            "visual_message_return_type": "unseen",
+            "thread_message_limit": str(thread_message_limit or 10),
+            "persistentBadging": "true",
+            "limit": str(PAGE_SIZE),
+            "is_prefetching": "false",
+        }
+        if box:
+            params["folder"] = "1" if box == "general" else "0"
+        if cursor:
+            params.update({"cursor": cursor, "direction": "older", "fetch_reason": "page_scroll"})
+        inbox = self.client.private_request("direct_v2/inbox/", params=params).get("inbox", {})
+        return inbox.get("threads", []), inbox.get("oldest_cursor")
+
+    def changed_since(self, since, box="", thread_message_limit=None, limit=None):
+        """Return (raw threads active after ``since``, new watermark), newest first.
+
+        ``limit`` caps how many changed threads are returned, keeping the
+        oldest ones so the returned watermark only covers those and the newer
+        rest are picked up by the next call. With no watermark yet (``since``
+        0) there is no backlog to work through: the newest ``limit`` threads
+        are returned instead, and only as many pages as that takes are read.
+        """
+        if since == "saved":
+            since = self.watermark
+        since = int(since or 0)
+        changed = []
+        cursor = None
+        while True:
+            threads, cursor = self._fetch_page(box, thread_message_limit, cursor)
+            changed.extend(t for t in threads if int(t.get("last_activity_at") or 0) > since)
+            # Pages are newest first; once one reaches the watermark the rest are older
+            reached = not threads or int(threads[-1].get("last_activity_at") or 0) <= since
+            if reached or not cursor or (not since and limit and len(changed) >= limit):
+                break
+        changed.sort(key=lambda t: int(t.get("last_activity_at") or 0), reverse=True)
+        if limit:
+            changed = changed[-limit:] if since else changed[:limit]
+        watermark = max((int(t.get("last_activity_at") or 0) for t in changed), default=since)
+        return changed, str(watermark)
@@ -0,0 +1,166 @@
+import logging
+import os
+import threading
+import time
+from functools import wraps
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Written by authenticate_instagram.py and refreshed here after every login
+DEFAULT_SETTINGS_FILE = "instagrapi_settings.json"
+
+# After a failed re-login, calls fail fast for this long instead of logging in again
+RELOGIN_BACKOFF = float(os.getenv("INSTAGRAM_RELOGIN_BACKOFF", "900"))
+
+SESSION_COOKIES = {
+    "sessionid": "INSTAGRAM_SESSIONID",
+    "ds_user_id": "INSTAGRAM_DS_USER_ID",
+    "csrftoken": "INSTAGRAM_CSRFTOKEN",
+    "mid": "INSTAGRAM_MID",
+    "rur": "INSTAGRAM_RUR",
+}
+
+
+class LazyClient:
+    """Drop-in stand-in for instagrapi.Client that defers login until first use.
+
+    The session is restored from the settings file (INSTAGRAM_SETTINGS_FILE,
+    default instagrapi_settings.json) when present, then from the
+    INSTAGRAM_* cookie variables, and only as a last resort by a full
+    username/password login. Any call failing with LoginRequired triggers
+    one re-login (persisted back to the settings file) and is retried once.
+    Calls that fail on the same expired session share that one login; a
+    failed login is not attempted again for INSTAGRAM_RELOGIN_BACKOFF seconds.
+
+    With a ``throttle`` (rate_limit.InstagramThrottle) every method call is
+    admitted by it first and its outcome reported back. With an ``account``
+    id every variable above is read with an ``_<ACCOUNT>`` suffix, and the
+    settings file defaults to instagrapi_settings_<account>.json.
+    """
+
+    def __init__(self, settings_file=None, username=None, password=None, throttle=None, account=None):
+        self._env_suffix = f"_{account.upper()}" if account else ""
+        default_settings = f"instagrapi_settings_{account}.json" if account else DEFAULT_SETTINGS_FILE
+        self._settings_file = Path(settings_file or self._env("INSTAGRAM_SETTINGS_FILE") or default_settings)
+        self._username = username or self._env("INSTAGRAM_USERNAME")
+        self._password = password or self._env("INSTAGRAM_PASSWORD")
+        self._client = None
+        self._lock = threading.RLock()
+        # Bumped by every successful re-login, so a caller can tell its failure is already handled
+        self._generation = 0
+        self._login_failed = None  # (monotonic time, error) of the last failed re-login
+        self.throttle = throttle
+
+    def _env(self, name):
+        return os.getenv(name + self._env_suffix)
+
+    @property
+    def is_initialized(self):
+        return self._client is not None
+
+    def get_client(self):
+        """Return the underlying Client, restoring the session on first call."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+    def _create_client(self):
+        # instagrapi takes a few hundred ms to import, so keep it off the startup path
+        from instagrapi import Client
+
+        client = Client()
+        if self._username and self._password:
+            client.username = self._username
+            client.password = self._password
+
+        if self._settings_file.exists():
+            try:
+                client.load_settings(self._settings_file)
+                logger.info("Restored Instagram session from %s.", self._settings_file)
+                return client
+            except Exception as e:
+                logger.warning("Could not restore session from %s: %s", self._settings_file, e)
+
+        cookies = {name: self._env(var) for name, var in SESSION_COOKIES.items()}
+        if all(cookies.values()):
+            client.set_settings({"cookies": cookies, "mid": cookies["mid"]})
+            logger.info("Loaded Instagram session from environment variables.")
+            return client
+
+        if self._username and self._password:
+            try:
+                client.login(self._username, self._password)
+                self._persist(client)
+                logger.info("Logged in to Instagram using username and password.")
+            except Exception as e:
+                logger.error("Instagram login failed: %s", e)
+        else:
+            logger.warning("No Instagram session or credentials found. Please set environment variables.")
+        return client
+
+    def _persist(self, client):
+        try:
+            client.dump_settings(self._settings_file)
+        except Exception as e:
+            logger.warning("Could not save Instagram session to %s: %s", self._settings_file, e)
+
+    def refresh(self, generation=None):
+        """Re-login after the stored session was rejected.
+
+        ``generation`` is the session generation the caller's failed call
+        ran on; if the session has been refreshed since, nothing is done.
+        """
+        from instagrapi.exceptions import LoginRequired
+
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            if self._login_failed and time.monotonic() - self._login_failed[0] < RELOGIN_BACKOFF:
+                raise LoginRequired(f"Instagram re-login failed recently: {self._login_failed[1]}")
+            client = self.get_client()
+            if not (client.username and client.password):
+                raise LoginRequired("Instagram session expired and no credentials are configured.")
+            client.relogin_attempt = 0
+            try:
+                client.login(client.username, client.password, relogin=True)
+            except Exception as e:
+                self._login_failed = (time.monotonic(), e)
+                raise
+            self._login_failed = None
+            self._generation += 1
+            self._persist(client)
+            logger.info("Refreshed Instagram session.")
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        attr = getattr(self.get_client(), name)
+        if not callable(attr):
+            return attr
+        from instagrapi.exceptions import LoginRequired
+
+        throttle = self.throttle
+
+        @wraps(attr)
+        def call_with_relogin(*args, **kwargs):
+            if throttle is not None:
+                throttle.before_call(name)
+            generation = self._generation
+            try:
+                try:
+                    result = attr(*args, **kwargs)
+                except LoginRequired:
+                    self.refresh(generation)
+                    result = getattr(self._client, name)(*args, **kwargs)
+            except Exception as e:
+                if throttle is not None:
+                    throttle.on_error(name, e)
+                raise
+            if throttle is not None:
+                throttle.on_success(name)
+            return result
+
+        return call_with_relogin
@@ -1,6 +1,21 @@
 from mcp.server.fastmcp import FastMCP
-from instagrapi import Client
+from instagram_session import LazyClient
+from user_cache import UserIdCache
+from thread_cache import ThreadMessageCache
+from inbox_index import InboxActivityIndex
+from rate_limit import InstagramThrottle, Pacer
+from media_cache import MediaDownloadCache
+from tool_worker import DEFAULT_SOCKET, serve, start_in_thread
+from tool_exec import offload
+from response import USER_SHORT_FIELDS, dumps, fit, project, serialized
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
 import argparse
+import atexit
+import inspect
+import signal
+import sys
+import threading
 from typing import Optional, List, Dict, Any
 import os
 from dotenv import load_dotenv
@@ -10,6 +25,12 @@ import subprocess
 import json
 from datetime import datetime
 
+# Shared helpers under utils/ live at the repo root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.health import HealthMonitor, probe_openrouter
+from utils.accounts import account_data_dir, account_ids, current_account
+from utils.tool_client import AccountRouter
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -22,47 +43,73 @@ This server provides tools for Instagram DM management and automation.
 It can list chats, fetch messages, send replies, and manage the DM poller system.
 """
 
-client = Client()
-
-# Try to load session/device info from environment variables
-sessionid = os.getenv("INSTAGRAM_SESSIONID")
-ds_user_id = os.getenv("INSTAGRAM_DS_USER_ID")
-csrftoken = os.getenv("INSTAGRAM_CSRFTOKEN")
-mid = os.getenv("INSTAGRAM_MID")
-rur = os.getenv("INSTAGRAM_RUR")
-
-if sessionid and ds_user_id and csrftoken and mid and rur:
-    # Set session settings directly
-    client.set_settings({
-        "sessionid": sessionid,
-        "ds_user_id": ds_user_id,
-        "csrftoken": csrftoken,
-        "mid": mid,
-        "rur": rur
-    })
-    print("Loaded Instagram session from environment variables.")
-else:
-    # Fallback to login with username/password
-    username = os.getenv("INSTAGRAM_USERNAME")
-    password = os.getenv("INSTAGRAM_PASSWORD")
-    if username and password:
-        try:
-            client.login(username, password)
-            print("Logged in to Instagram using username and password.")
-        except Exception as e:
-            print(f"Instagram login failed: {e}")
-    else:
-        print("No Instagram session or credentials found. Please set environment variables.")
+# Multi-account mode: with INSTAGRAM_ACCOUNTS set, this process only routes
+# Instagram tools to one worker per account (started with INSTAGRAM_ACCOUNT)
+ACCOUNT = current_account()
+ACCOUNTS = account_ids()
+ROUTE_TO_ACCOUNTS = ACCOUNT is None and bool(ACCOUNTS)
+account_router = AccountRouter(ACCOUNTS, timeout=int(os.getenv("ACCOUNT_CALL_TIMEOUT", "600"))) if ROUTE_TO_ACCOUNTS else None
+
+# Every Instagram call passes through one shared throttle and circuit breaker
+instagram_throttle = InstagramThrottle()
+
+# Instagram session is restored lazily on the first tool call that needs it
+client = LazyClient(throttle=instagram_throttle, account=ACCOUNT)
 
 mcp = FastMCP(
    name="Instagram DMs",
    instructions=INSTRUCTIONS
 )
 
+# Plain (blocking) tool functions by name, for the tool worker and --tool
+TOOL_FUNCTIONS: Dict[str, Any] = {}
+
+def _routed(fn):
+    """Stand-in for ``fn`` that runs it on the worker of the ``account`` argument."""
+    signature = inspect.signature(fn)
+
+    @wraps(fn)
+    def forward(*args, account: str = "", **kwargs):
+        arguments = signature.bind(*args, **kwargs).arguments
+        return account_router.call(fn.__name__, account=account or None, **arguments)
+
+    account_param = inspect.Parameter("account", inspect.Parameter.KEYWORD_ONLY, default="", annotation=str)
+    forward.__signature__ = signature.replace(parameters=[*signature.parameters.values(), account_param])
+    forward.__doc__ = (fn.__doc__ or "") + f"\n    Runs as `account` (one of: {', '.join(ACCOUNTS)}; default: {ACCOUNTS[0]}).\n"
+    return forward
+
+def tool(pool: str = "instagram", max_concurrent: Optional[int] = None, account_bound: bool = True):
+    """Register a blocking tool with MCP as an async tool.
+
+    MCP calls run on the given executor pool (see tool_exec.POOL_SIZES) so a
+    slow download never stalls cheap calls; ``max_concurrent`` caps how many
+    calls of this tool run at once. The module-level name stays the plain
+    function. In multi-account mode ``account_bound`` tools are forwarded
+    to the account's worker, which applies the concurrency cap itself.
+    """
+    def decorator(fn):
+        if ROUTE_TO_ACCOUNTS and account_bound:
+            return _register(_routed(fn), pool, None)
+        return _register(fn, pool, max_concurrent)
+    return decorator
+
+def _register(fn, pool, max_concurrent):
+    call, run = offload(fn, pool=pool, max_concurrent=max_concurrent)
+    mcp.tool()(serialized(run))
+    TOOL_FUNCTIONS[fn.__name__] = call
+    return call
+
 # Data file paths
 DATA_DIR = Path("data")
 LOGS_FILE = DATA_DIR / "logs.json"
 
+# Outgoing DM pacing shared by every send in this process
+DM_SENDS_PER_MINUTE = int(os.getenv("DM_SENDS_PER_MINUTE", "20"))
+dm_pacer = Pacer(DM_SENDS_PER_MINUTE)
+# At 20/min, 100 sends take 5 minutes: inside ACCOUNT_CALL_TIMEOUT's default 600s
+SEND_MESSAGES_MAX = int(os.getenv("SEND_MESSAGES_MAX", "100"))
+LOOKUP_WORKERS = int(os.getenv("USER_LOOKUP_WORKERS", "8"))
+
 def _read_json(path):
     if not path.exists():
         return []
@@ -74,7 +121,65 @@ def _write_json(path, data):
     with open(path, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2)
 
-@mcp.tool()
+# Caches belong to the account they were filled from
+ACCOUNT_DIR = account_data_dir(ACCOUNT)
+
+# Persistent username <-> user_id cache shared by every tool that takes a username
+user_id_cache = UserIdCache(ACCOUNT_DIR / "user_id_cache.json")
+
+# Per-thread message cache; only messages newer than the last sync are fetched
+thread_cache = ThreadMessageCache(client, ACCOUNT_DIR / "threads")
+# Per-thread last activity behind list_chats' delta mode
+inbox_index = InboxActivityIndex(client, ACCOUNT_DIR / "inbox_activity.json")
+
+def _resolve_user_id(username: str) -> Optional[str]:
+    """Return the user ID for a username, calling Instagram only on a cache miss."""
+    user_id = user_id_cache.get_user_id(username)
+    if user_id is None:
+        resolved = client.user_id_from_username(username)
+        if not resolved:
+            return None
+        user_id = str(resolved)
+        user_id_cache.put(username, user_id)
+    return user_id
+
+def _resolve_user_ids(usernames: List[str]) -> Dict[str, Optional[str]]:
+    """Resolve many usernames at once, cache first and then on a bounded thread pool.
+
+    Used by every tool that takes a list of usernames; failed lookups map to None.
+    """
+    def lookup(username):
+        try:
+            return _resolve_user_id(username)
+        except Exception as e:
+            logger.debug("Could not resolve %s: %s", username, e)
+            return None
+
+    resolved = {}
+    misses = []
+    for username in dict.fromkeys(usernames):
+        user_id = user_id_cache.get_user_id(username)
+        if user_id is None:
+            misses.append(username)
+        resolved[username] = user_id
+    if len(misses) == 1:
+        resolved[misses[0]] = lookup(misses[0])
+    elif misses:
+        # Latency follows the slowest lookup rather than the sum of them
+        with ThreadPoolExecutor(max_workers=min(LOOKUP_WORKERS, len(misses))) as pool:
+            resolved.update(zip(misses, pool.map(lookup, misses)))
+    return resolved
+
+def _resolve_username(user_id: str) -> Optional[str]:
+    """Return the username for a user ID, calling Instagram only on a cache miss."""
+    username = user_id_cache.get_username(user_id)
+    if username is None:
+        username = client.username_from_user_id(user_id)
+        if username:
+            user_id_cache.put(username, user_id)
+    return username
+
+@tool(pool="local", account_bound=False)
 def get_recent_logs(limit: int = 20, username: Optional[str] = None) -> Dict[str, Any]:
     """Get recent DM interaction logs with optional filtering.
     
@@ -109,7 +214,7 @@ def get_recent_logs(limit: int = 20, username: Optional[str] = None) -> Dict[str
             "error": str(e)
         }
 
-@mcp.tool()
+@tool(pool="local", account_bound=False)
 def get_processing_stats() -> Dict[str, Any]:
     """Get comprehensive processing statistics from logs.
     
@@ -174,7 +279,35 @@ def get_processing_stats() -> Dict[str, Any]:
             "error": str(e)
         }
 
-@mcp.tool()
+# --- Health ---
+def _probe_instagram() -> str:
+    # Don't spend a request (or a half-open trial) while Instagram is blocking us
+    if instagram_throttle.snapshot()["circuit"] != "closed":
+        return "throttled"
+    client.account_info()
+    return "connected"
+
+
+health_monitor = HealthMonitor({"instagram": _probe_instagram, "openrouter": probe_openrouter})
+
+_recent_activity_cache = {"mtime": None, "count": 0}
+
+
+def _recent_activity() -> int:
+    """Timestamped entries among the last 10 logs, re-read only when the log file changes."""
+    try:
+        mtime = LOGS_FILE.stat().st_mtime_ns
+    except OSError:
+        return 0
+    if _recent_activity_cache["mtime"] != mtime:
+        logs = _read_json(LOGS_FILE)
+        _recent_activity_cache.update(
+            mtime=mtime, count=len([log for log in logs[-10:] if log.get("timestamp")])
+        )
+    return _recent_activity_cache["count"]
+
+
+@tool(pool="local")
 def get_system_status() -> Dict[str, Any]:
     """Get overall system status including backend, Instagram connection, and OpenRouter.
     
@@ -182,36 +315,32 @@ def get_system_status() -> Dict[str, Any]:
         A dictionary with system status information.
     """
     try:
-        # Check Instagram connection
-        instagram_status = "unknown"
-        try:
-            # Try a simple API call to check connection
-            client.user_info_by_username("instagram")
-            instagram_status = "connected"
-        except Exception as e:
-            instagram_status = f"error: {str(e)[:100]}"
-        
-        # Check OpenRouter API key
-        openrouter_status = "configured" if os.getenv("OPENROUTER_API_KEY") else "not_configured"
-        
+        # Probes run in the background; this only reads their cached results
+        health = health_monitor.start().snapshot()
+        instagram, openrouter = health["instagram"], health["openrouter"]
+        instagram_status = instagram["status"]
+        if instagram_status == "error":
+            instagram_status = f"error: {instagram['error'][:100]}"
+        openrouter_status = openrouter["status"]
+        if openrouter_status == "error":
+            openrouter_status = f"error: {openrouter['error'][:100]}"
+
         # Check data files
         data_files = {
             "targets": False,
             "logs": LOGS_FILE.exists(),
             "templates": False
         }
-        
-        # Get recent activity
-        logs = _read_json(LOGS_FILE)
-        recent_activity = len([log for log in logs[-10:] if log.get("timestamp")])
-        
+
         return {
             "success": True,
             "status": {
                 "instagram_connection": instagram_status,
+                "instagram_throttle": instagram_throttle.snapshot(),
                 "openrouter_api": openrouter_status,
                 "data_files": data_files,
-                "recent_activity": recent_activity,
+                "recent_activity": _recent_activity(),
+                "health": health,
                 "last_check": datetime.utcnow().isoformat()
             }
         }
@@ -221,7 +350,22 @@ def get_system_status() -> Dict[str, Any]:
             "error": str(e)
         }
 
-@mcp.tool()
+def _send_dm(username, text, user_id):
+    """Paced send of one DM to an already resolved user ID."""
+    if not username or not text:
+        return {"success": False, "message": "Username and message must be provided."}
+    if not user_id:
+        return {"success": False, "message": f"User '{username}' not found."}
+    dm_pacer.wait()
+    try:
+        dm = client.direct_send(text, [int(user_id)])
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+    if dm:
+        return {"success": True, "message": "Message sent to user.", "direct_message_id": getattr(dm, 'id', None)}
+    return {"success": False, "message": "Failed to send message."}
+
+@tool()
 def send_message(username: str, message: str) -> Dict[str, Any]:
     """Send an Instagram direct message to a user by username.
 
@@ -234,37 +378,72 @@ def send_message(username: str, message: str) -> Dict[str, Any]:
     if not username or not message:
         return {"success": False, "message": "Username and message must be provided."}
     try:
-        user_id = int(client.user_id_from_username(username))
-        if not user_id:
-            return {"success": False, "message": f"User '{username}' not found."}
-        dm = client.direct_send(message, [user_id])
-        if dm:
-            return {"success": True, "message": "Message sent to user.", "direct_message_id": getattr(dm, 'id', None)}
-        else:
-            return {"success": False, "message": "Failed to send message."}
+        user_id = _resolve_user_id(username)
     except Exception as e:
         return {"success": False, "message": str(e)}
+    return _send_dm(username, message, user_id)
+
+@tool(max_concurrent=1)
+def send_messages(messages: List[Dict[str, str]], max_workers: int = 4) -> Dict[str, Any]:
+    """Send Instagram direct messages to many users at a paced, safe rate.
+
+    Args:
+        messages: List of {"username": ..., "message": ...} items, at most
+            SEND_MESSAGES_MAX (default 100) per call so the batch finishes
+            within the call timeout; split larger batches.
+        max_workers: Number of concurrent senders (default 4). Sends are
+            still spaced at DM_SENDS_PER_MINUTE across all workers.
+    Returns:
+        A dictionary with per-recipient results (in input order) and counts.
+    """
+    if not messages or not isinstance(messages, list):
+        return {"success": False, "message": "A non-empty list of messages must be provided."}
+    if len(messages) > SEND_MESSAGES_MAX:
+        return {"success": False, "message": f"At most {SEND_MESSAGES_MAX} messages per call; split the batch."}
 
-@mcp.tool()
-def list_messages(thread_id: str, amount: int = 20) -> Dict[str, Any]:
+    user_ids = _resolve_user_ids([m.get("username") for m in messages if m.get("username")])
+
+    def send_one(item):
+        username = item.get("username")
+        return {"username": username, **_send_dm(username, item.get("message"), user_ids.get(username))}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(messages)))) as pool:
+        results = list(pool.map(send_one, messages))
+
+    sent = sum(1 for r in results if r["success"])
+    return {"success": sent == len(results), "sent": sent, "failed": len(results) - sent, "results": results}
+
+@tool()
+def list_messages(thread_id: str, amount: int = 20, since_id: Optional[str] = None) -> Dict[str, Any]:
     """Get messages from a specific thread.
 
     Args:
         thread_id: The thread ID to get messages from.
         amount: Number of messages to retrieve (default: 20).
+        since_id: Only return messages newer than this message ID, the oldest
+            `amount` of them, so moving `since_id` forward misses none (default: None).
     Returns:
-        A dictionary with success status and list of messages.
+        A dictionary with success status and list of messages, newest first.
+        If `since_id` is no longer in the thread, no messages are returned
+        and `since_id_found` is false.
     """
     if not thread_id:
         return {"success": False, "message": "Thread ID must be provided."}
     try:
-        messages = client.direct_messages(int(thread_id), amount=amount)
+        messages = thread_cache.messages(thread_id, amount, since_id=since_id)
+        if messages is None:
+            return {"success": True, "messages": [], "since_id_found": False}
+        usernames = thread_cache.usernames(thread_id)
         formatted_messages = []
         for msg in messages:
+            user_id = getattr(msg, 'user_id', None)
+            outgoing = bool(getattr(msg, 'is_sent_by_viewer', False)) or str(user_id) == str(client.user_id)
             formatted_msg = {
                 "id": getattr(msg, 'id', None),
                 "text": getattr(msg, 'text', ''),
-                "from": getattr(msg, 'user_id', None),
+                "from": user_id,
+                "username": None if outgoing else usernames.get(str(user_id)) or _resolve_username(str(user_id)),
+                "is_outgoing": outgoing,
                 "timestamp": getattr(msg, 'timestamp', None),
                 "item_type": getattr(msg, 'item_type', 'text'),
                 "handled": False
@@ -274,7 +453,7 @@ def list_messages(thread_id: str, amount: int = 20) -> Dict[str, Any]:
     except Exception as e:
         return {"success": False, "message": str(e)}
 
-@mcp.tool()
+@tool(pool="local")
 def mark_message_seen(thread_id: str, message_id: str) -> Dict[str, Any]:
     """Mark a message as seen in a thread.
 
@@ -293,13 +472,14 @@ def mark_message_seen(thread_id: str, message_id: str) -> Dict[str, Any]:
     except Exception as e:
         return {"success": False, "message": str(e)}
 
-@mcp.tool()
+@tool()
 def list_chats(
     amount: int = 20,
     selected_filter: str = "",
     thread_message_limit: Optional[int] = None,
     full: bool = False,
     fields: Optional[List[str]] = None,
+    since: Optional[str] = None,
 ) -> Dict[str, Any]:
     """Get list of Instagram DM chats/threads.
 
@@ -308,29 +488,47 @@ def list_chats(
         selected_filter: Filter for specific thread types (default: "").
         thread_message_limit: Limit messages per thread (default: None).
         full: Return full thread objects (default: False).
-        fields: Specific fields to return (default: None).
+        fields: Field paths to return, e.g. ["id", "users.username", "messages.text"] (default: None).
+        since: Watermark from a previous call; only threads with newer activity
+            are returned, oldest `amount` first. "0" returns the newest `amount`
+            threads and a watermark to continue from. "saved" resumes from the
+            saved watermark and moves it past the returned threads; other
+            values never change it (default: None, no delta).
     Returns:
-        A dictionary with success status and list of threads.
+        A dictionary with success status, list of threads and, in delta mode,
+        the new watermark to pass as `since` next time.
     """
     def thread_summary(thread):
         return {
             "thread_id": getattr(thread, 'id', None),
             "users": [{"user_id": getattr(user, 'pk', None), "username": getattr(user, 'username', None)} for user in getattr(thread, 'users', [])],
-            "last_activity": getattr(thread, 'last_activity', None),
+            "last_activity": getattr(thread, 'last_activity_at', None),
             "unseen_count": getattr(thread, 'unseen_count', 0)
         }
 
-    def filter_fields(thread, fields):
-        return {field: getattr(thread, field, None) for field in fields}
-
     try:
-        threads = client.direct_threads(amount=amount, box=selected_filter, thread_message_limit=thread_message_limit)
+        result = {"success": True}
+        if since is None:
+            threads = client.direct_threads(amount=amount, box=selected_filter, thread_message_limit=thread_message_limit)
+        else:
+            from instagrapi.extractors import extract_direct_thread
+            raw_threads, result["watermark"] = inbox_index.changed_since(
+                since, box=selected_filter, thread_message_limit=thread_message_limit, limit=amount
+            )
+            if since == "saved":
+                inbox_index.save_watermark(result["watermark"])
+            threads = [extract_direct_thread(t) for t in raw_threads]
+        user_id_cache.put_many(
+            (getattr(user, 'username', None), getattr(user, 'pk', None))
+            for t in threads for user in getattr(t, 'users', [])
+        )
         if full:
-            return {"success": True, "threads": [t.dict() if hasattr(t, 'dict') else str(t) for t in threads]}
+            result["threads"] = [project(t) for t in threads]
         elif fields:
-            return {"success": True, "threads": [filter_fields(t, fields) for t in threads]}
+            result["threads"] = [project(t, fields) for t in threads]
         else:
-            return {"success": True, "threads": [thread_summary(t) for t in threads]}
+            result["threads"] = [thread_summary(t) for t in threads]
+        return fit(result, "threads")
     except Exception as e:
         import traceback
         print("Exception in list_chats:", repr(e))
@@ -338,7 +536,7 @@ def list_chats(
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
+@tool(pool="media")
 def send_photo_message(username: str, photo_path: str) -> Dict[str, Any]:
     """Send a photo via Instagram direct message to a user by username.
 
@@ -356,11 +554,11 @@ def send_photo_message(username: str, photo_path: str) -> Dict[str, Any]:
         return {"success": False, "message": f"Photo file not found: {photo_path}"}
     
     try:
-        user_id = int(client.user_id_from_username(username))
+        user_id = _resolve_user_id(username)
         if not user_id:
             return {"success": False, "message": f"User '{username}' not found."}
         
-        result = client.direct_send_photo(Path(photo_path), [user_id])
+        result = client.direct_send_photo(Path(photo_path), [int(user_id)])
         if result:
             return {"success": True, "message": "Photo sent successfully.", "direct_message_id": getattr(result, 'id', None)}
         else:
@@ -369,7 +567,7 @@ def send_photo_message(username: str, photo_path: str) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
+@tool(pool="media")
 def send_video_message(username: str, video_path: str) -> Dict[str, Any]:
     """Send a video via Instagram direct message to a user by username.
 
@@ -386,11 +584,11 @@ def send_video_message(username: str, video_path: str) -> Dict[str, Any]:
         return {"success": False, "message": f"Video file not found: {video_path}"}
     
     try:
-        user_id = int(client.user_id_from_username(username))
+        user_id = _resolve_user_id(username)
         if not user_id:
             return {"success": False, "message": f"User '{username}' not found."}
 
-        result = client.direct_send_video(Path(video_path), [user_id])
+        result = client.direct_send_video(Path(video_path), [int(user_id)])
         if result:
             return {"success": True, "message": "Video sent successfully.", "direct_message_id": getattr(result, 'id', None)}
         else:
@@ -399,28 +597,30 @@ def send_video_message(username: str, video_path: str) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
-def list_pending_chats(amount: int = 20) -> Dict[str, Any]:
+@tool()
+def list_pending_chats(amount: int = 20, fields: Optional[List[str]] = None) -> Dict[str, Any]:
     """Get Instagram Direct Message threads (chats) from the user's pending inbox.
 
     Args:
         amount: Number of pending threads to fetch (default 20).
+        fields: Field paths to return, e.g. ["id", "users.username"] (default: all).
     Returns:
         A dictionary with success status and the list of pending threads or error message.
     """
     try:
         threads = client.direct_pending_inbox(amount)
-        return {"success": True, "threads": [t.dict() if hasattr(t, 'dict') else str(t) for t in threads]}
+        return fit({"success": True, "threads": [project(t, fields) for t in threads]}, "threads")
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
-def search_threads(query: str) -> Dict[str, Any]:
+@tool()
+def search_threads(query: str, fields: Optional[List[str]] = None) -> Dict[str, Any]:
     """Search Instagram Direct Message threads by username or keyword.
 
     Args:
         query: The search term (username or keyword).
+        fields: Field paths to return for each result (default: all).
     Returns:
         A dictionary with success status and the search results or error message.
     """
@@ -428,12 +628,12 @@ def search_threads(query: str) -> Dict[str, Any]:
         return {"success": False, "message": "Query must be provided."}
     try:
         results = client.direct_search(query)
-        return {"success": True, "results": [r.dict() if hasattr(r, 'dict') else str(r) for r in results]}
+        return fit({"success": True, "results": [project(r, fields) for r in results]}, "results")
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
+@tool()
 def get_thread_by_participants(user_ids: List[int]) -> Dict[str, Any]:
     """Get an Instagram Direct Message thread by participant user IDs.
 
@@ -451,7 +651,7 @@ def get_thread_by_participants(user_ids: List[int]) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
+@tool()
 def get_thread_details(thread_id: str, amount: int = 20) -> Dict[str, Any]:
     """Get details and messages for a specific Instagram Direct Message thread by thread ID, with an optional message limit.
 
@@ -464,13 +664,13 @@ def get_thread_details(thread_id: str, amount: int = 20) -> Dict[str, Any]:
     if not thread_id:
         return {"success": False, "message": "Thread ID must be provided."}
     try:
-        thread = client.direct_thread(int(thread_id), amount)
+        thread = thread_cache.thread(thread_id, amount)
         return {"success": True, "thread": thread if isinstance(thread, dict) else str(thread)}
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
+@tool()
 def get_user_id_from_username(username: str) -> Dict[str, Any]:
     """Get the Instagram user ID for a given username.
 
@@ -482,7 +682,7 @@ def get_user_id_from_username(username: str) -> Dict[str, Any]:
     if not username:
         return {"success": False, "message": "Username must be provided."}
     try:
-        user_id = str(client.user_id_from_username(username))
+        user_id = _resolve_user_id(username)
         if user_id:
             return {"success": True, "user_id": user_id}
         else:
@@ -491,7 +691,7 @@ def get_user_id_from_username(username: str) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
+@tool()
 def get_username_from_user_id(user_id: str) -> Dict[str, Any]:
     """Get the Instagram username for a given user ID.
 
@@ -503,7 +703,7 @@ def get_username_from_user_id(user_id: str) -> Dict[str, Any]:
     if not user_id:
         return {"success": False, "message": "User ID must be provided."}
     try:
-        username = client.username_from_user_id(user_id)
+        username = _resolve_username(user_id)
         if username:
             return {"success": True, "username": username}
         else:
@@ -512,7 +712,7 @@ def get_username_from_user_id(user_id: str) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
+@tool()
 def get_user_info(username: str) -> Dict[str, Any]:
     """Get detailed information about an Instagram user.
 
@@ -548,7 +748,7 @@ def get_user_info(username: str) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
+@tool()
 def check_user_online_status(usernames: List[str]) -> Dict[str, Any]:
     """Check the online status of Instagram users.
 
@@ -561,18 +761,12 @@ def check_user_online_status(usernames: List[str]) -> Dict[str, Any]:
         return {"success": False, "message": "A list of usernames must be provided."}
     
     try:
-        user_ids = []
-        username_to_id = {}
-        
-        # Get user IDs for the usernames
-        for username in usernames:
-            try:
-                user_id = str(client.user_id_from_username(username))
-                if user_id:
-                    user_ids.append(user_id)
-                    username_to_id[user_id] = username
-            except:
-                continue
+        # Get user IDs for the usernames (cached ids first, misses in parallel)
+        username_to_id = {
+            user_id: username
+            for username, user_id in _resolve_user_ids(usernames).items() if user_id
+        }
+        user_ids = list(username_to_id)
         
         if not user_ids:
             return {"success": False, "message": "No valid users found."}
@@ -590,7 +784,7 @@ def check_user_online_status(usernames: List[str]) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
+@tool()
 def search_users(query: str) -> Dict[str, Any]:
     """Search for Instagram users by name or username.
 
@@ -623,7 +817,7 @@ def search_users(query: str) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
+@tool()
 def get_user_stories(username: str) -> Dict[str, Any]:
     """Get Instagram stories from a user.
 
@@ -636,7 +830,7 @@ def get_user_stories(username: str) -> Dict[str, Any]:
         return {"success": False, "message": "Username must be provided."}
     
     try:
-        user_id = str(client.user_id_from_username(username))
+        user_id = _resolve_user_id(username)
         if not user_id:
             return {"success": False, "message": f"User '{username}' not found."}
         
@@ -667,7 +861,7 @@ def get_user_stories(username: str) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
+@tool()
 def like_media(media_url: str, like: bool = True) -> Dict[str, Any]:
     """Like or unlike an Instagram post.
 
@@ -700,13 +894,14 @@ def like_media(media_url: str, like: bool = True) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
-def get_user_followers(username: str, count: int = 20) -> Dict[str, Any]:
+@tool(max_concurrent=2)
+def get_user_followers(username: str, count: int = 20, fields: Optional[List[str]] = None) -> Dict[str, Any]:
     """Get followers of an Instagram user.
 
     Args:
         username: Instagram username to get followers for.
         count: Maximum number of followers to return (default 20).
+        fields: User fields to return (default: user_id, username, full_name, is_private, profile_pic_url).
     Returns:
         A dictionary with success status and followers list.
     """
@@ -714,35 +909,26 @@ def get_user_followers(username: str, count: int = 20) -> Dict[str, Any]:
         return {"success": False, "message": "Username must be provided."}
     
     try:
-        user_id = str(client.user_id_from_username(username))
+        user_id = _resolve_user_id(username)
         if not user_id:
             return {"success": False, "message": f"User '{username}' not found."}
         
         followers = client.user_followers(user_id, amount=count)
         
-        follower_results = []
-        for follower_id, follower in followers.items():
-            follower_data = {
-                "user_id": str(follower.pk),
-                "username": follower.username,
-                "full_name": follower.full_name,
-                "is_private": follower.is_private,
-                "profile_pic_url": str(follower.profile_pic_url) if follower.profile_pic_url else None,
-            }
-            follower_results.append(follower_data)
-        
-        return {"success": True, "followers": follower_results, "count": len(follower_results)}
+        follower_results = project(list(followers.values()), fields or USER_SHORT_FIELDS)
+        return fit({"success": True, "followers": follower_results, "count": len(follower_results)}, "followers")
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
-def get_user_following(username: str, count: int = 20) -> Dict[str, Any]:
+@tool(max_concurrent=2)
+def get_user_following(username: str, count: int = 20, fields: Optional[List[str]] = None) -> Dict[str, Any]:
     """Get users that an Instagram user is following.
 
     Args:
         username: Instagram username to get following list for.
         count: Maximum number of following to return (default 20).
+        fields: User fields to return (default: user_id, username, full_name, is_private, profile_pic_url).
     Returns:
         A dictionary with success status and following list.
     """
@@ -750,35 +936,43 @@ def get_user_following(username: str, count: int = 20) -> Dict[str, Any]:
         return {"success": False, "message": "Username must be provided."}
     
     try:
-        user_id = str(client.user_id_from_username(username))
+        user_id = _resolve_user_id(username)
         if not user_id:
             return {"success": False, "message": f"User '{username}' not found."}
         
         following = client.user_following(user_id, amount=count)
         
-        following_results = []
-        for following_id, followed_user in following.items():
-            following_data = {
-                "user_id": str(followed_user.pk),
-                "username": followed_user.username,
-                "full_name": followed_user.full_name,
-                "is_private": followed_user.is_private,
-                "profile_pic_url": str(followed_user.profile_pic_url) if followed_user.profile_pic_url else None,
-            }
-            following_results.append(following_data)
-        
-        return {"success": True, "following": following_results, "count": len(following_results)}
+        following_results = project(list(following.values()), fields or USER_SHORT_FIELDS)
+        return fit({"success": True, "following": following_results, "count": len(following_results)}, "following")
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
-def get_user_posts(username: str, count: int = 12) -> Dict[str, Any]:
+def _post_summary(media) -> Dict[str, Any]:
+    media_data = {
+        "media_id": str(media.pk),
+        "media_type": media.media_type,  # 1=photo, 2=video, 8=album
+        "caption": media.caption_text if media.caption_text else "",
+        "like_count": media.like_count,
+        "comment_count": media.comment_count,
+        "taken_at": str(media.taken_at),
+        "media_url": str(media.thumbnail_url) if media.thumbnail_url else None,
+    }
+    if media.media_type == 2 and media.video_url:
+        media_data["video_url"] = str(media.video_url)
+        media_data["video_duration"] = media.video_duration
+    return media_data
+
+
+@tool()
+def get_user_posts(username: str, count: int = 12, fields: Optional[List[str]] = None) -> Dict[str, Any]:
     """Get recent posts from an Instagram user.
 
     Args:
         username: Instagram username to get posts from.
         count: Maximum number of posts to return (default 12).
+        fields: Media fields to return, e.g. ["media_id=pk", "caption_text", "user.username"]
+            (default: id, type, caption, counts, taken_at, media URL, and video URL/duration for videos).
     Returns:
         A dictionary with success status and posts list.
     """
@@ -786,31 +980,17 @@ def get_user_posts(username: str, count: int = 12) -> Dict[str, Any]:
         return {"success": False, "message": "Username must be provided."}
     
     try:
-        user_id = str(client.user_id_from_username(username))
+        user_id = _resolve_user_id(username)
         if not user_id:
             return {"success": False, "message": f"User '{username}' not found."}
         
         medias = client.user_medias(user_id, amount=count)
         
-        media_results = []
-        for media in medias:
-            media_data = {
-                "media_id": str(media.pk),
-                "media_type": media.media_type,  # 1=photo, 2=video, 8=album
-                "caption": media.caption_text if media.caption_text else "",
-                "like_count": media.like_count,
-                "comment_count": media.comment_count,
-                "taken_at": str(media.taken_at),
-                "media_url": str(media.thumbnail_url) if media.thumbnail_url else None,
-            }
-            
-            if media.media_type == 2 and media.video_url:
-                media_data["video_url"] = str(media.video_url)
-                media_data["video_duration"] = media.video_duration
-            
-            media_results.append(media_data)
-        
-        return {"success": True, "posts": media_results, "count": len(media_results)}
+        if fields:
+            media_results = project(medias, fields)
+        else:
+            media_results = [_post_summary(media) for media in medias]
+        return fit({"success": True, "posts": media_results, "count": len(media_results)}, "posts")
     except Exception as e:
         return {"success": False, "message": str(e)}
 
@@ -820,24 +1000,62 @@ def _ensure_download_directory(download_path: str) -> None:
     Path(download_path).mkdir(parents=True, exist_ok=True)
 
 
+# One content-addressed download cache per download directory
+_media_caches: Dict[str, MediaDownloadCache] = {}
+_media_caches_lock = threading.Lock()
+ALBUM_DOWNLOAD_WORKERS = int(os.getenv("ALBUM_DOWNLOAD_WORKERS", "4"))
+
+
+def _media_cache(download_path: str) -> MediaDownloadCache:
+    key = str(Path(download_path).resolve())
+    # Media downloads run in parallel; two instances on one directory would overwrite each other's index
+    with _media_caches_lock:
+        if key not in _media_caches:
+            _media_caches[key] = MediaDownloadCache(download_path)
+        return _media_caches[key]
+
+
+@atexit.register
+def _flush_media_caches():
+    # Cache hits only batch their access times; keep the LRU order across restarts
+    for cache in list(_media_caches.values()):
+        cache.flush()
+
+
+def _download_album_resources(media, folder: Path) -> List[Path]:
+    """Download every album item concurrently (instagrapi's album_download is serial)."""
+    def download(resource):
+        filename = str(resource.pk)
+        if resource.media_type == 1:
+            return client.photo_download_by_url(resource.thumbnail_url, filename, folder)
+        elif resource.media_type == 2:
+            return client.video_download_by_url(resource.video_url, filename, folder)
+        raise ValueError(f"Unsupported album item type: {resource.media_type}")
+
+    with ThreadPoolExecutor(max_workers=max(1, min(ALBUM_DOWNLOAD_WORKERS, len(media.resources)))) as pool:
+        return list(pool.map(download, media.resources))
+
+
 def _download_single_media(media, download_path: str) -> str:
-    """Download a single media item and return the file path."""
+    """Download a single media item and return the file path, reusing a cached copy if present."""
     media_type = media.media_type
-    if media_type == 1:  # Photo
-        return str(client.photo_download(int(media.pk), Path(download_path)))
-    elif media_type == 2:  # Video
-        return str(client.video_download(int(media.pk), Path(download_path)))
-    else:
+
+    def fetch(folder):
+        if media_type == 1:  # Photo
+            return "photo", [client.photo_download(int(media.pk), folder)]
+        elif media_type == 2:  # Video
+            return "video", [client.video_download(int(media.pk), folder)]
         raise ValueError(f"Unsupported media type: {media_type}")
 
+    return _media_cache(download_path).get(media.pk, fetch)["paths"][0]
+
 
 def _find_message_in_thread(thread_id: str, message_id: str):
-    """Find a specific message in a thread."""
-    messages = client.direct_messages(int(thread_id), 100)
-    return next((m for m in messages if str(m.id) == message_id), None)
+    """Find a specific message in a thread, served from the local thread cache when possible."""
+    return thread_cache.find_message(thread_id, message_id, window=100)
 
 
-@mcp.tool()
+@tool()
 def list_media_messages(thread_id: str, limit: int = 100) -> Dict[str, Any]:
     """List all messages containing media in an Instagram direct message thread.
     Args:
@@ -848,7 +1066,7 @@ def list_media_messages(thread_id: str, limit: int = 100) -> Dict[str, Any]:
     """
     try:
         limit = min(limit, 200)
-        messages = client.direct_messages(int(thread_id), limit)
+        messages = thread_cache.messages(thread_id, limit)
         media_messages = []
         for message in messages:
             if message.media:
@@ -870,7 +1088,7 @@ def list_media_messages(thread_id: str, limit: int = 100) -> Dict[str, Any]:
             "message": f"Failed to list media messages: {str(e)}"
         }
 
-@mcp.tool()
+@tool(pool="media", max_concurrent=2)
 def download_media_from_message(message_id: str, thread_id: str, download_path: str = "./downloads") -> Dict[str, Any]:
     """Download media from a specific Instagram direct message and get the local file path.
     Args:
@@ -909,7 +1127,7 @@ def download_media_from_message(message_id: str, thread_id: str, download_path:
         }
 
 
-@mcp.tool()
+@tool(pool="media", max_concurrent=2)
 def download_shared_post_from_message(message_id: str, thread_id: str, download_path: str = "./downloads") -> Dict[str, Any]:
     """Download media from a shared post/reel/clip in a DM message and get the local file path.
     Args:
@@ -939,23 +1157,23 @@ def download_shared_post_from_message(message_id: str, thread_id: str, download_
                     break
         if not shared_url:
             return {"success": False, "message": "This message does not contain a supported shared post/reel/clip"}
-        # Download using Instagrapi
+        # Download using Instagrapi, or reuse the cached files for this media pk
         try:
             media_pk = str(client.media_pk_from_url(shared_url))
-            media = client.media_info(media_pk)
-            if media.media_type == 1:
-                file_path = str(client.photo_download(int(media_pk), Path(download_path)))
-                media_type = "photo"
-            elif media.media_type == 2:
-                file_path = str(client.video_download(int(media_pk), Path(download_path)))
-                media_type = "video"
-            elif media.media_type == 8:  # album
-                # Download all items in album
-                album_paths = client.album_download(int(media_pk), Path(download_path))
-                file_path = str(album_paths)
-                media_type = "album"
-            else:
-                return {"success": False, "message": f"Unsupported media type: {media.media_type}"}
+
+            def fetch(folder):
+                media = client.media_info(media_pk)
+                if media.media_type == 1:
+                    return "photo", [client.photo_download_by_url(media.thumbnail_url, media_pk, folder)]
+                elif media.media_type == 2:
+                    return "video", [client.video_download_by_url(media.video_url, media_pk, folder)]
+                elif media.media_type == 8:  # album
+                    return "album", _download_album_resources(media, folder)
+                raise ValueError(f"Unsupported media type: {media.media_type}")
+
+            cached = _media_cache(download_path).get(media_pk, fetch)
+            media_type = cached["media_type"]
+            file_path = str(cached["paths"]) if media_type == "album" else cached["paths"][0]
             return {
                 "success": True,
                 "message": "Shared post/reel/clip downloaded successfully",
@@ -971,7 +1189,7 @@ def download_shared_post_from_message(message_id: str, thread_id: str, download_
         return {"success": False, "message": f"Failed to process message: {str(e)}"}
 
 
-@mcp.tool()
+@tool()
 def delete_message(thread_id: str, message_id: str) -> Dict[str, Any]:
     """Delete a message from a direct message thread.
 
@@ -994,7 +1212,7 @@ def delete_message(thread_id: str, message_id: str) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
+@tool()
 def mute_conversation(thread_id: str, mute: bool = True) -> Dict[str, Any]:
     """Mute or unmute a direct message conversation.
 
@@ -1023,8 +1241,77 @@ def mute_conversation(thread_id: str, mute: bool = True) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
+def _tool_functions() -> Dict[str, Any]:
+    """Map of registered MCP tool names to their plain Python functions."""
+    return dict(TOOL_FUNCTIONS)
+
+
+def _parse_tool_args(fn, extra: List[str]) -> Dict[str, Any]:
+    """Turn trailing ``--name value`` pairs into keyword arguments typed by ``fn``'s signature."""
+    params = inspect.signature(fn).parameters
+    tool_args = {}
+    for flag, value in zip(extra[::2], extra[1::2]):
+        name = flag.lstrip("-")
+        annotation = params[name].annotation if name in params else str
+        if annotation is bool:
+            value = value.lower() in ("1", "true", "yes")
+        elif annotation in (int, float):
+            value = annotation(value)
+        elif value[:1] in "[{":
+            value = json.loads(value)
+        tool_args[name] = value
+    return tool_args
+
+
+def _run_http(transport: str, host: str, port: int, worker_socket: Optional[str]) -> None:
+    """Serve MCP over HTTP so Claude Desktop, the API and scripts share one warm process.
+
+    Unless disabled, the Unix-socket tool worker runs alongside on a thread.
+    uvicorn handles SIGINT/SIGTERM by refusing new connections and letting
+    in-flight requests finish for up to MCP_SHUTDOWN_GRACE seconds.
+    """
+    import uvicorn
+
+    app = mcp.streamable_http_app() if transport == "streamable-http" else mcp.sse_app()
+    worker = start_in_thread(_tool_functions(), worker_socket) if worker_socket else None
+    config = uvicorn.Config(
+        app,
+        host=host,
+        port=port,
+        log_level="info",
+        timeout_graceful_shutdown=int(os.getenv("MCP_SHUTDOWN_GRACE", "10")),
+    )
+    # uvicorn re-raises SIGTERM once drained; make that a normal exit so the cleanup below runs
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        uvicorn.Server(config).run()
+    finally:
+        if worker:
+            worker.shutdown()
+            worker.server_close()
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    args = parser.parse_args()
-    
-    mcp.run(transport="stdio")
+    parser.add_argument("--worker", action="store_true", help="Serve tools over a local Unix socket (used by the API and scripts)")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Socket path for --worker")
+    parser.add_argument("--tool", help="Run one tool and print its JSON result; pass its arguments as --name value")
+    parser.add_argument("--transport", choices=["stdio", "streamable-http", "sse"], default="stdio", help="MCP transport (default: stdio)")
+    parser.add_argument("--host", default=os.getenv("MCP_HTTP_HOST", "127.0.0.1"), help="Bind address for HTTP transports")
+    parser.add_argument("--port", type=int, default=int(os.getenv("MCP_HTTP_PORT", "8765")), help="Port for HTTP transports")
+    parser.add_argument("--no-worker", action="store_true", help="With an HTTP transport, don't also serve the tool worker socket")
+    args, extra = parser.parse_known_args()
+
+    if args.worker:
+        logging.basicConfig(level=logging.INFO)
+        serve(_tool_functions(), args.socket)
+    elif args.tool:
+        fn = _tool_functions().get(args.tool)
+        if fn is None:
+            parser.error(f"Unknown tool: {args.tool}")
+        print(dumps(fn(**_parse_tool_args(fn, extra))))
+    elif args.transport != "stdio":
+        logging.basicConfig(level=logging.INFO)
+        _run_http(args.transport, args.host, args.port, None if args.no_worker else args.socket)
+    else:
+        mcp.run(transport="stdio")
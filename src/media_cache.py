@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_MAX_BYTES = int(float(os.getenv("MEDIA_CACHE_MAX_MB", "1024")) * 1024 * 1024)
+INDEX_NAME = ".media_index.json"
+
+
+class MediaDownloadCache:
+    """Download cache keyed by media pk, storing content-addressed files.
+
+    Files are named by the SHA-256 of their contents inside ``root`` so the
+    same bytes are only stored once. An index maps each media pk to its
+    files, their sizes and the media type; once the files on disk (each
+    counted once, however many entries share it) pass ``max_bytes`` the
+    least recently requested entries are evicted. A cache hit only updates
+    the access time in memory; those are written with the next index save,
+    or after ``flush_every`` hits or ``flush_interval`` seconds.
+    """
+
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES, flush_every=50, flush_interval=60.0):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._index_path = self.root / INDEX_NAME
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._index = self._load_index()
+        self._touched = 0
+        self._saved_at = time.monotonic()
+
+    def _load_index(self):
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self._index_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(tmp, self._index_path)
+        self._touched = 0
+        self._saved_at = time.monotonic()
+
+    def flush(self):
+        """Persist access times recorded since the last index save."""
+        with self._lock:
+            if self._touched:
+                self._save_index()
+
+    def lookup(self, key):
+        """Return the cached entry for ``key`` ({"media_type", "paths"}) or None."""
+        key = str(key)
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            if not all((self.root / name).exists() for name in entry["files"]):
+                del self._index[key]
+                self._save_index()
+                return None
+            entry["last_access"] = time.time()
+            self._touched += 1
+            if self._touched >= self.flush_every or time.monotonic() - self._saved_at >= self.flush_interval:
+                self._save_index()
+            return self._public(entry)
+
+    def _public(self, entry):
+        return {
+            "media_type": entry["media_type"],
+            "paths": [str((self.root / name).resolve()) for name in entry["files"]],
+        }
+
+    def get(self, key, fetch):
+        """Return the entry for ``key``, calling ``fetch(folder) -> (media_type, [paths])`` on a miss."""
+        key = str(key)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # Concurrent requests for the same media wait for one download
+        with key_lock:
+            entry = self.lookup(key)
+            if entry is not None:
+                return entry
+            self.root.mkdir(parents=True, exist_ok=True)
+            try:
+                with tempfile.TemporaryDirectory(dir=self.root, prefix=".download-") as tmp:
+                    media_type, paths = fetch(Path(tmp))
+                    files = [self._store(Path(p)) for p in paths]
+            except Exception:
+                with self._lock:
+                    if key not in self._index:
+                        self._key_locks.pop(key, None)
+                raise
+            with self._lock:
+                self._index[key] = {
+                    "media_type": media_type,
+                    "files": files,
+                    "sizes": [(self.root / name).stat().st_size for name in files],
+                    "last_access": time.time(),
+                }
+                self._evict(keep=key)
+                self._save_index()
+                return self._public(self._index[key])
+
+    def _store(self, path):
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        name = digest.hexdigest() + path.suffix.lower()
+        target = self.root / name
+        if target.exists():
+            path.unlink()
+        else:
+            shutil.move(str(path), target)
+        return name
+
+    def _sizes(self, entry):
+        if "sizes" not in entry:
+            # Entries written before per-file sizes were recorded
+            entry["sizes"] = [
+                (self.root / name).stat().st_size if (self.root / name).exists() else 0
+                for name in entry["files"]
+            ]
+        return entry["sizes"]
+
+    def _evict(self, keep=None):
+        sizes, refs = {}, {}
+        for entry in self._index.values():
+            for name, size in zip(entry["files"], self._sizes(entry)):
+                sizes[name] = size
+                refs[name] = refs.get(name, 0) + 1
+        total = sum(sizes.values())
+        if total <= self.max_bytes:
+            return
+        for key, entry in sorted(self._index.items(), key=lambda kv: kv[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            del self._index[key]
+            self._key_locks.pop(key, None)
+            for name in entry["files"]:
+                refs[name] -= 1
+                if not refs[name]:
+                    total -= sizes[name]
+                    (self.root / name).unlink(missing_ok=True)
@@ -0,0 +1,217 @@
+import os
+import threading
+import time
+
+
+class Pacer:
+    """Spaces calls evenly at ``per_minute`` across all threads sharing it.
+
+    Each caller reserves the next free slot and sleeps until it arrives, so
+    a pool of workers never exceeds the rate however many are waiting.
+    """
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ThrottledError(RuntimeError):
+    """Raised instead of calling Instagram while the circuit is open or a bucket is exhausted."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(f"{message} Retry after {int(retry_after) + 1}s.")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket whose refill rate can be scaled down adaptively."""
+
+    def __init__(self, per_minute, burst):
+        self.per_minute = per_minute
+        self.burst = burst
+        self.slowdown = 1.0  # divides the refill rate after rate-limit responses
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        rate = self.per_minute / 60.0 / self.slowdown
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * rate)
+        self._updated = now
+
+    def reserve(self, now):
+        """Take a token; return how long the caller must wait before using it."""
+        self._refill(now)
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens / (self.per_minute / 60.0 / self.slowdown)
+
+    def snapshot(self):
+        self._refill(time.monotonic())
+        return {
+            "per_minute": round(self.per_minute / self.slowdown, 2),
+            "tokens": round(max(self._tokens, 0.0), 2),
+            "slowdown": round(self.slowdown, 2),
+        }
+
+
+# instagrapi client methods grouped by how Instagram rate-limits them
+ENDPOINT_CLASSES = {
+    "send": {"direct_send", "direct_send_photo", "direct_send_video", "direct_answer", "direct_message_delete"},
+    "search": {"search_users", "direct_search"},
+    "graph": {"user_followers", "user_following", "user_medias", "user_stories"},
+    "engage": {"media_like", "media_unlike", "direct_thread_mute", "direct_thread_unmute"},
+    "inbox": {"direct_threads", "direct_thread", "direct_messages", "direct_pending_inbox",
+              "direct_thread_by_participants", "direct_users_presence", "private_request"},
+    "lookup": {"user_id_from_username", "username_from_user_id", "user_info_by_username", "media_info"},
+    "media": {"photo_download", "video_download", "photo_download_by_url", "video_download_by_url"},
+}
+# Client methods that never reach Instagram
+UNTHROTTLED = {"media_pk_from_url", "get_settings", "set_settings", "load_settings", "dump_settings", "login", "relogin"}
+
+# (per minute, burst); override with IG_THROTTLE_<CLASS>=rate/burst
+DEFAULT_LIMITS = {
+    "send": (30, 5),
+    "search": (20, 3),
+    "graph": (10, 2),
+    "engage": (20, 3),
+    "inbox": (60, 10),
+    "lookup": (60, 10),
+    "media": (60, 10),
+    "default": (60, 10),
+}
+
+# Exception class names that mean "slow down" and how long to stop entirely
+BLOCKING_ERRORS = {
+    "FeedbackRequired": 3600,
+    "SentryBlock": 3600,
+    "ChallengeRequired": 1800,
+    "PleaseWaitFewMinutes": 600,
+}
+SLOWDOWN_ERRORS = {"RateLimitError", "ClientThrottledError"}
+
+
+class InstagramThrottle:
+    """Shared throttle and circuit breaker for every call to the Instagram client.
+
+    Each endpoint class has a token bucket. A rate-limit response halves that
+    class's refill rate (recovering gradually on success); a block such as
+    feedback_required, or three rate-limit responses in a row, opens the
+    circuit so every call fails fast with a retry-after hint until the
+    cooldown ends. One trial call is then let through: success closes the
+    circuit, failure reopens it with double the cooldown.
+    """
+
+    def __init__(self, max_wait=None):
+        self.max_wait = float(max_wait if max_wait is not None else os.getenv("IG_THROTTLE_MAX_WAIT", "60"))
+        self._lock = threading.Lock()
+        self._buckets = {}
+        for name, (rate, burst) in DEFAULT_LIMITS.items():
+            override = os.getenv(f"IG_THROTTLE_{name.upper()}")
+            if override:
+                rate, _, burst = override.partition("/")
+                rate, burst = float(rate), int(burst or DEFAULT_LIMITS[name][1])
+            self._buckets[name] = TokenBucket(rate, burst)
+        self._state = "closed"
+        self._open_until = 0.0
+        self._cooldown = 0.0
+        self._reason = None
+        self._trial_in_flight = False
+        self._consecutive_limits = 0
+
+    @staticmethod
+    def endpoint_class(method):
+        if method in UNTHROTTLED:
+            return None
+        for name, methods in ENDPOINT_CLASSES.items():
+            if method in methods:
+                return name
+        return "default"
+
+    def before_call(self, method):
+        """Block until ``method`` may run, or raise ThrottledError."""
+        endpoint = self.endpoint_class(method)
+        if endpoint is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if self._state != "closed":
+                if now < self._open_until:
+                    raise ThrottledError(f"Instagram circuit open ({self._reason}).", self._open_until - now)
+                if self._trial_in_flight:
+                    raise ThrottledError("Instagram circuit half-open, trial call in progress.", 5)
+            delay = self._buckets[endpoint].reserve(now)
+            if delay > self.max_wait:
+                self._buckets[endpoint]._tokens += 1  # give the token back
+                raise ThrottledError(f"Instagram '{endpoint}' rate limit reached.", delay)
+            # Only a call that will actually run may take the trial slot
+            if self._state != "closed":
+                self._state = "half_open"
+                self._trial_in_flight = True
+        if delay > 0:
+            time.sleep(delay)
+
+    def on_success(self, method):
+        endpoint = self.endpoint_class(method)
+        if endpoint is None:
+            return
+        with self._lock:
+            bucket = self._buckets[endpoint]
+            bucket.slowdown = max(1.0, bucket.slowdown * 0.9)
+            self._consecutive_limits = 0
+            if self._state == "half_open":
+                self._state = "closed"
+                self._cooldown = 0.0
+                self._reason = None
+            self._trial_in_flight = False
+
+    def on_error(self, method, exc):
+        endpoint = self.endpoint_class(method)
+        if endpoint is None:
+            return
+        names = {cls.__name__ for cls in type(exc).__mro__}
+        with self._lock:
+            half_open_trial = self._state == "half_open"
+            self._trial_in_flight = False
+            block = next((BLOCKING_ERRORS[n] for n in BLOCKING_ERRORS if n in names), None)
+            if block is None and names & SLOWDOWN_ERRORS:
+                bucket = self._buckets[endpoint]
+                bucket.slowdown = min(16.0, bucket.slowdown * 2)
+                self._consecutive_limits += 1
+                if self._consecutive_limits >= 3:
+                    block = 300
+            if block is not None:
+                cooldown = max(block, self._cooldown * 2) if half_open_trial else block
+                self._open(cooldown, type(exc).__name__)
+            elif half_open_trial:
+                # Trial failed for an unrelated reason; let the next call try again
+                self._state = "half_open"
+
+    def _open(self, cooldown, reason):
+        self._state = "open"
+        self._cooldown = cooldown
+        self._open_until = time.monotonic() + cooldown
+        self._reason = reason
+
+    def snapshot(self):
+        with self._lock:
+            now = time.monotonic()
+            state = self._state
+            if state == "open" and now >= self._open_until:
+                state = "half_open"
+            return {
+                "circuit": state,
+                "reason": self._reason,
+                "retry_after": round(max(0.0, self._open_until - now), 1) if state == "open" else 0,
+                "endpoints": {name: bucket.snapshot() for name, bucket in self._buckets.items()},
+            }
@@ -0,0 +1,137 @@
+import os
+from functools import lru_cache, wraps
+
+import pydantic_core
+
+# Budget for one list in a tool response, and for any single string in it
+MAX_RESPONSE_BYTES = int(os.getenv("TOOL_RESPONSE_MAX_BYTES", str(256 * 1024)))
+MAX_STRING_CHARS = int(os.getenv("TOOL_RESPONSE_MAX_STRING", "2000"))
+
+# Default views for instagrapi models; "name=path" renames, "a.b" reaches into nested models
+USER_SHORT_FIELDS = ["user_id=pk", "username", "full_name", "is_private", "profile_pic_url"]
+
+
+class EncodedList(list):
+    """A list whose items ``fit`` has already encoded; ``dumps`` reuses those bytes."""
+
+    def __init__(self, items, encoded):
+        super().__init__(items)
+        self.encoded = encoded
+
+
+def _to_json(obj) -> bytes:
+    return pydantic_core.to_json(obj, fallback=str)
+
+
+def _has_encoded(obj):
+    return isinstance(obj, EncodedList) or (isinstance(obj, dict) and any(_has_encoded(v) for v in obj.values()))
+
+
+def _encode(obj) -> bytes:
+    if isinstance(obj, EncodedList) and len(obj.encoded) == len(obj):
+        return b"[" + b",".join(obj.encoded) + b"]"
+    if isinstance(obj, dict) and _has_encoded(obj):
+        # Splice pre-encoded lists in (at any depth of dicts, e.g. the worker's {"result": ...})
+        return b"{" + b",".join(_to_json(str(k)) + b":" + _encode(v) for k, v in obj.items()) + b"}"
+    return _to_json(obj)
+
+
+def dumps(obj) -> str:
+    """Compact JSON via pydantic-core's native encoder; unknown types fall back to str()."""
+    return _encode(obj).decode()
+
+
+@lru_cache(maxsize=256)
+def _compile(fields):
+    tree = {}
+    for field in fields:
+        out, _, path = field.rpartition("=")
+        parts = path.split(".")
+        node = tree
+        for i, part in enumerate(parts):
+            key = (out or part) if i == 0 else part
+            attr, sub = node.get(key, (part, None))
+            if i < len(parts) - 1:
+                sub = sub if sub is not None else {}
+            node[key] = (attr, sub)
+            node = sub
+    return tree
+
+
+def _get(obj, attr):
+    if isinstance(obj, dict):
+        return obj.get(attr)
+    return getattr(obj, attr, None)
+
+
+def _leaf(value):
+    if isinstance(value, str):
+        if len(value) > MAX_STRING_CHARS:
+            return value[:MAX_STRING_CHARS] + "…"
+        return value
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return _clip(pydantic_core.to_jsonable_python(value, fallback=str))
+
+
+def _clip(value):
+    if isinstance(value, str):
+        return _leaf(value)
+    if isinstance(value, list):
+        return [_clip(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _clip(v) for k, v in value.items()}
+    return value
+
+
+def _project(obj, tree):
+    if tree is None:
+        return _leaf(obj)
+    if obj is None:
+        return None
+    if isinstance(obj, (list, tuple)):
+        return [_project(item, tree) for item in obj]
+    return {key: _project(_get(obj, attr), sub) for key, (attr, sub) in tree.items()}
+
+
+def project(obj, fields=None):
+    """Reduce a model (or dict, or list of either) to the given field paths.
+
+    ``fields`` entries are attribute paths such as ``"users.username"``;
+    lists along a path are projected element-wise. ``"name=path"`` renames
+    a top-level field. Without ``fields`` the whole object is converted.
+    """
+    if not fields:
+        return _leaf(obj)
+    return _project(obj, _compile(tuple(fields)))
+
+
+def fit(payload, key, max_bytes=MAX_RESPONSE_BYTES):
+    """Trim ``payload[key]`` to the items whose UTF-8 encoded size fits ``max_bytes``.
+
+    When items are dropped, ``payload["truncated"]`` records how many were
+    returned out of how many, so callers can narrow ``fields`` or page.
+    Each item is encoded once here and ``dumps`` reuses the bytes.
+    """
+    items = payload.get(key) or []
+    encoded = []
+    used = 0
+    for item in items:
+        data = _to_json(item)
+        used += len(data) + 1
+        if used > max_bytes:
+            payload["truncated"] = {"returned": len(encoded), "total": len(items), "max_bytes": max_bytes}
+            break
+        encoded.append(data)
+    payload[key] = EncodedList(items[:len(encoded)], encoded)
+    return payload
+
+
+def serialized(run):
+    """Wrap an async tool so MCP gets compact JSON text instead of an indented dump."""
+    @wraps(run)
+    async def call(*args, **kwargs):
+        result = await run(*args, **kwargs)
+        return result if isinstance(result, str) else dumps(result)
+
+    return call
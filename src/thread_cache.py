@@ -0,0 +1,200 @@
+import copy
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_CACHE_DIR = Path("data") / "threads"
+PAGE_SIZE = 20
+MAX_ITEMS_PER_THREAD = 500
+
+
+class ThreadMessageCache:
+    """Local per-thread message store that only fetches what is new.
+
+    Raw thread items are kept newest-first, keyed by item id, and persisted
+    to one JSON file per thread. A sync pages through the thread from the
+    newest item and stops at the first id already cached; older history is
+    only fetched (from the stored oldest cursor) when a caller asks for more
+    messages than are cached. Syncs closer together than ``min_interval``
+    seconds are served without any request, except delta reads
+    (``messages(since_id=...)``), which always check for new items.
+    """
+
+    def __init__(self, client, cache_dir=None, min_interval=None):
+        self.client = client
+        self.cache_dir = Path(cache_dir or os.getenv("THREAD_CACHE_DIR", DEFAULT_CACHE_DIR))
+        self.min_interval = float(min_interval if min_interval is not None else os.getenv("THREAD_SYNC_INTERVAL", "5"))
+        self._threads = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    # --- storage ---
+    def _path(self, thread_id):
+        return self.cache_dir / f"{thread_id}.json"
+
+    def _lock(self, thread_id):
+        with self._locks_guard:
+            return self._locks.setdefault(thread_id, threading.Lock())
+
+    def _state(self, thread_id):
+        state = self._threads.get(thread_id)
+        if state is None:
+            state = {"thread": None, "items": [], "oldest_cursor": None}
+            try:
+                with open(self._path(thread_id), "r", encoding="utf-8") as f:
+                    state.update(json.load(f))
+            except (OSError, ValueError):
+                pass
+            state["synced_at"] = 0.0
+            state["by_id"] = {item["item_id"]: item for item in state["items"]}
+            state["parsed"] = {}
+            self._threads[thread_id] = state
+        return state
+
+    def _reset(self, state, items, oldest_cursor):
+        state["items"] = items
+        state["by_id"] = {item["item_id"]: item for item in items}
+        state["parsed"] = {}
+        state["oldest_cursor"] = oldest_cursor
+
+    def _save(self, thread_id, state):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(thread_id)
+        tmp = path.with_suffix(".json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({k: state[k] for k in ("thread", "items", "oldest_cursor")}, f)
+        os.replace(tmp, path)
+
+    # --- network ---
+    def _fetch_page(self, thread_id, cursor=None):
+        params = {
+            "visual_message_return_type": "unseen",
+            "direction": "older",
+            "seq_id": "40065",
+            "limit": str(PAGE_SIZE),
+        }
+        if cursor:
+            params["cursor"] = cursor
+        return self.client.private_request(f"direct_v2/threads/{thread_id}/", params=params)["thread"]
+
+    def _sync(self, thread_id, state, amount, force=False, until_id=None):
+        """Fetch new items; with ``until_id``, keep paging until that item is reached."""
+        changed = False
+        if force or time.monotonic() - state["synced_at"] >= self.min_interval:
+            # Pull pages from the newest end until we reach an item we already have
+            new_items = []
+            cursor = None
+            overlap = reached = False
+            limit = MAX_ITEMS_PER_THREAD if until_id else max(amount, PAGE_SIZE)
+            while True:
+                page = self._fetch_page(thread_id, cursor)
+                for item in page.get("items", []):
+                    if item["item_id"] in state["by_id"]:
+                        overlap = True
+                        break
+                    new_items.append(item)
+                    if item["item_id"] == until_id:
+                        reached = True
+                        break
+                state["thread"] = {k: v for k, v in page.items() if k != "items"}
+                cursor = page.get("oldest_cursor")
+                if overlap or reached or not cursor or len(new_items) >= limit:
+                    break
+            if overlap:
+                if new_items:
+                    state["items"] = new_items + state["items"]
+                    state["by_id"].update((item["item_id"], item) for item in new_items)
+                    changed = True
+            elif new_items or state["items"]:
+                # Empty cache, or too much new traffic to reach it: restart history from this batch
+                self._reset(state, new_items, cursor)
+                changed = True
+            state["synced_at"] = time.monotonic()
+
+        # Backfill older history only when the caller wants more than we hold
+        while not until_id and len(state["items"]) < amount and state["oldest_cursor"]:
+            page = self._fetch_page(thread_id, state["oldest_cursor"])
+            older = [item for item in page.get("items", []) if item["item_id"] not in state["by_id"]]
+            state["items"].extend(older)
+            state["by_id"].update((item["item_id"], item) for item in older)
+            state["oldest_cursor"] = page.get("oldest_cursor")
+            changed = True
+            if not older:
+                break
+
+        if len(state["items"]) > MAX_ITEMS_PER_THREAD:
+            for item in state["items"][MAX_ITEMS_PER_THREAD:]:
+                state["by_id"].pop(item["item_id"], None)
+                state["parsed"].pop(item["item_id"], None)
+            del state["items"][MAX_ITEMS_PER_THREAD:]
+            state["oldest_cursor"] = None
+        if changed:
+            self._save(thread_id, state)
+
+    # --- parsing ---
+    def _message(self, state, item):
+        from instagrapi.extractors import extract_direct_message
+
+        message = state["parsed"].get(item["item_id"])
+        if message is None:
+            raw = copy.deepcopy(item)
+            raw["thread_id"] = (state["thread"] or {}).get("thread_id")
+            message = extract_direct_message(raw)
+            state["parsed"][item["item_id"]] = message
+        return message
+
+    # --- public API ---
+    def messages(self, thread_id, amount=20, since_id=None):
+        """Return up to ``amount`` DirectMessage objects, newest first.
+
+        With ``since_id``, the thread is synced back to that message and the
+        oldest ``amount`` messages after it are returned, so a caller moving
+        its ``since_id`` forward sees every message exactly once. If it isn't
+        found (unsent, or more than MAX_ITEMS_PER_THREAD items back), None
+        is returned: nothing tells which of the cached messages came after it.
+        """
+        thread_id = str(thread_id)
+        with self._lock(thread_id):
+            state = self._state(thread_id)
+            since_id = str(since_id) if since_id else None
+            # A delta read asks what is new right now; a throttled sync would hide it
+            self._sync(thread_id, state, amount, force=bool(since_id), until_id=since_id)
+            items = state["items"]
+            if not since_id:
+                items = items[:amount]
+            elif since_id not in state["by_id"]:
+                return None
+            else:
+                items = items[:next(i for i, item in enumerate(items) if item["item_id"] == since_id)]
+                items = items[-amount:] if amount else []
+            return [self._message(state, item) for item in items]
+
+    def usernames(self, thread_id):
+        """Map user id -> username for the thread's participants, from cached metadata."""
+        with self._lock(str(thread_id)):
+            thread = self._state(str(thread_id))["thread"] or {}
+        return {str(u.get("pk")): u.get("username") for u in thread.get("users", [])}
+
+    def thread(self, thread_id, amount=20):
+        """Return a DirectThread built from cached metadata and the newest ``amount`` items."""
+        from instagrapi.extractors import extract_direct_thread
+
+        thread_id = str(thread_id)
+        with self._lock(thread_id):
+            state = self._state(thread_id)
+            self._sync(thread_id, state, amount)
+            data = copy.deepcopy(state["thread"])
+            data["items"] = copy.deepcopy(state["items"][:amount])
+            return extract_direct_thread(data)
+
+    def find_message(self, thread_id, message_id, window=100):
+        """Look a message up locally; on a miss, sync new items and up to ``window`` older ones."""
+        thread_id, message_id = str(thread_id), str(message_id)
+        with self._lock(thread_id):
+            state = self._state(thread_id)
+            if message_id not in state["by_id"]:
+                self._sync(thread_id, state, window, force=True)
+            item = state["by_id"].get(message_id)
+            return self._message(state, item) if item else None
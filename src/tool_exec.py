@@ -0,0 +1,52 @@
+import os
+import threading
+from functools import partial, wraps
+
+import anyio
+
+# Executor pools: tools in one pool never wait behind tools in another
+POOL_SIZES = {
+    "local": int(os.getenv("TOOL_POOL_LOCAL", "4")),          # log/stat reads, no network
+    "instagram": int(os.getenv("TOOL_POOL_INSTAGRAM", "16")),  # ordinary API calls
+    "media": int(os.getenv("TOOL_POOL_MEDIA", "4")),           # uploads and downloads
+}
+
+_limiters = {}
+
+
+def _limiter(pool):
+    # Created on first use so they bind to the running event loop
+    limiter = _limiters.get(pool)
+    if limiter is None:
+        limiter = _limiters[pool] = anyio.CapacityLimiter(POOL_SIZES[pool])
+    return limiter
+
+
+def offload(fn, pool="instagram", max_concurrent=None):
+    """Split a blocking tool into a (sync, async) pair sharing one concurrency limit.
+
+    The sync callable enforces ``max_concurrent`` with a thread semaphore so
+    direct callers (the tool worker, the CLI) respect it too. The async
+    callable waits for a slot without holding a thread, then runs the sync
+    one on the ``pool`` executor.
+    """
+    slots = threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+    async_slots = []
+
+    @wraps(fn)
+    def call(*args, **kwargs):
+        if slots is None:
+            return fn(*args, **kwargs)
+        with slots:
+            return fn(*args, **kwargs)
+
+    @wraps(fn)
+    async def run(*args, **kwargs):
+        if slots is None:
+            return await anyio.to_thread.run_sync(partial(call, *args, **kwargs), limiter=_limiter(pool))
+        if not async_slots:
+            async_slots.append(anyio.Semaphore(max_concurrent))
+        async with async_slots[0]:
+            return await anyio.to_thread.run_sync(partial(call, *args, **kwargs), limiter=_limiter(pool))
+
+    return call, run
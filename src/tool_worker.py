@@ -0,0 +1,100 @@
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import threading
+from pathlib import Path
+
+from response import dumps
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = os.getenv("MCP_WORKER_SOCKET", str(Path(__file__).parent.parent / "data" / "mcp_worker.sock"))
+
+
+class _ToolRequestHandler(socketserver.StreamRequestHandler):
+    """One client connection: newline-delimited JSON requests answered in order.
+
+    Request:  {"tool": "list_messages", "args": {"thread_id": "..."}}
+    Response: {"ok": true, "result": {...}} or {"ok": false, "error": "..."}
+    """
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                fn = self.server.tools.get(request.get("tool"))
+                if fn is None:
+                    response = {"ok": False, "error": f"Unknown tool: {request.get('tool')}"}
+                else:
+                    response = {"ok": True, "result": fn(**(request.get("args") or {}))}
+            except Exception as e:
+                response = {"ok": False, "error": str(e)}
+            self.wfile.write((dumps(response) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class ToolWorker(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Long-lived process serving MCP tool functions over a Unix socket.
+
+    The Instagram session, caches and pacers live for the life of the
+    worker, so a tool call costs one local round trip.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, tools, socket_path=DEFAULT_SOCKET):
+        self.tools = tools
+        self.socket_path = Path(socket_path)
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.socket_path.exists():
+            if _is_listening(self.socket_path):
+                raise RuntimeError(f"A tool worker is already listening on {self.socket_path}")
+            self.socket_path.unlink()
+        super().__init__(str(self.socket_path), _ToolRequestHandler)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            self.socket_path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _is_listening(path):
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(str(path))
+        return True
+    except OSError:
+        return False
+    finally:
+        s.close()
+
+
+def start_in_thread(tools, socket_path=DEFAULT_SOCKET):
+    """Serve tools on a background thread; stop with ``shutdown()`` then ``server_close()``."""
+    server = ToolWorker(tools, socket_path)
+    threading.Thread(target=server.serve_forever, name="tool-worker", daemon=True).start()
+    logger.info("Tool worker listening on %s", socket_path)
+    return server
+
+
+def serve(tools, socket_path=DEFAULT_SOCKET):
+    """Run a tool worker until SIGTERM/SIGINT."""
+    server = ToolWorker(tools, socket_path)
+
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    logger.info("Tool worker listening on %s", socket_path)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
@@ -0,0 +1,84 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_CACHE_FILE = Path("data") / "user_id_cache.json"
+DEFAULT_TTL = 7 * 24 * 3600  # usernames can be changed, ids never are
+
+
+class UserIdCache:
+    """Persistent bidirectional username <-> user_id map with a TTL.
+
+    Entries are stored as {username: {"user_id": str, "ts": epoch}} and
+    written back atomically whenever new pairs are learned.
+    """
+
+    def __init__(self, path=None, ttl=None):
+        self.path = Path(path or os.getenv("USER_ID_CACHE_FILE", DEFAULT_CACHE_FILE))
+        self.ttl = float(ttl if ttl is not None else os.getenv("USER_ID_CACHE_TTL", DEFAULT_TTL))
+        self._lock = threading.Lock()
+        self._by_username = {}
+        self._by_id = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        for username, entry in data.items():
+            if now - entry.get("ts", 0) < self.ttl:
+                self._by_username[username] = entry
+                self._by_id[entry["user_id"]] = username
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._by_username, f)
+        os.replace(tmp, self.path)
+
+    def _fresh(self, entry):
+        return entry is not None and time.time() - entry["ts"] < self.ttl
+
+    def get_user_id(self, username):
+        entry = self._by_username.get(username.lower())
+        return entry["user_id"] if self._fresh(entry) else None
+
+    def get_username(self, user_id):
+        username = self._by_id.get(str(user_id))
+        if username is None or not self._fresh(self._by_username.get(username)):
+            return None
+        return username
+
+    def put_many(self, pairs):
+        """Record (username, user_id) pairs; returns how many were new or changed."""
+        now = time.time()
+        changed = 0
+        with self._lock:
+            for username, user_id in pairs:
+                if not username or not user_id:
+                    continue
+                username, user_id = str(username).lower(), str(user_id)
+                entry = self._by_username.get(username)
+                if entry and entry["user_id"] == user_id and now - entry["ts"] < self.ttl / 2:
+                    continue
+                if entry and entry["user_id"] != user_id:
+                    self._by_id.pop(entry["user_id"], None)
+                old_username = self._by_id.get(user_id)
+                if old_username and old_username != username:
+                    # Account was renamed; drop the stale username
+                    self._by_username.pop(old_username, None)
+                self._by_username[username] = {"user_id": user_id, "ts": now}
+                self._by_id[user_id] = username
+                changed += 1
+            if changed:
+                self._save()
+        return changed
+
+    def put(self, username, user_id):
+        self.put_many([(username, user_id)])
@@ -0,0 +1,23 @@
+import os
+from pathlib import Path
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+
+
+def account_ids():
+    """Accounts from INSTAGRAM_ACCOUNTS (comma separated); empty in single-account mode."""
+    return [a.strip() for a in os.getenv("INSTAGRAM_ACCOUNTS", "").split(",") if a.strip()]
+
+
+def current_account():
+    """The account this process serves (INSTAGRAM_ACCOUNT, set on per-account workers), or None."""
+    return os.getenv("INSTAGRAM_ACCOUNT") or None
+
+
+def account_data_dir(account=None):
+    """Where an account keeps its caches; the plain data directory in single-account mode."""
+    return DATA_DIR / "accounts" / account if account else DATA_DIR
+
+
+def account_socket(account):
+    return str(account_data_dir(account) / "mcp_worker.sock")
@@ -0,0 +1,73 @@
+import os
+import random
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+HEALTH_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "60"))
+HEALTH_JITTER = float(os.getenv("HEALTH_CHECK_JITTER", "0.2"))
+OPENROUTER_KEY_URL = "https://openrouter.ai/api/v1/auth/key"
+
+
+class HealthMonitor:
+    """Runs health probes on background threads and serves their last results.
+
+    ``probes`` maps a name to a callable returning a short status string
+    (or raising). Each probe re-runs every ``interval`` seconds, spread by
+    +/- ``jitter`` so several processes don't probe in lockstep. Reading
+    the status never touches the network.
+    """
+
+    def __init__(self, probes, interval=HEALTH_INTERVAL, jitter=HEALTH_JITTER):
+        self.probes = probes
+        self.interval = interval
+        self.jitter = jitter
+        self._results = {name: {"status": "pending", "checked_at": None} for name in probes}
+        self._started = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def start(self):
+        """Start the probe threads; safe to call on every request."""
+        if self._started:
+            return self
+        with self._lock:
+            if not self._started:
+                for name, probe in self.probes.items():
+                    threading.Thread(target=self._run, args=(name, probe), name=f"health-{name}", daemon=True).start()
+                self._started = True
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, name, probe):
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            try:
+                result = {"status": probe()}
+            except Exception as e:
+                result = {"status": "error", "error": str(e)[:200]}
+            result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            result["checked_at"] = datetime.utcnow().isoformat()
+            # Replace, don't mutate, so readers never see a half-written result
+            self._results = {**self._results, name: result}
+            self._stop.wait(self.interval * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def snapshot(self):
+        """Latest result per probe; "pending" until the first probe finishes."""
+        return self._results
+
+
+def probe_openrouter(timeout=10):
+    """Check the OpenRouter key without spending tokens."""
+    api_key = os.getenv("OPENROUTER_API_KEY")
+    if not api_key:
+        return "not_configured"
+    response = requests.get(OPENROUTER_KEY_URL, headers={"Authorization": f"Bearer {api_key}"}, timeout=timeout)
+    if response.status_code == 401:
+        return "invalid_key"
+    response.raise_for_status()
+    return "connected"
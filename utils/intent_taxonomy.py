@@ -0,0 +1,100 @@
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+TAXONOMY_FILE = Path(os.getenv("INTENT_TAXONOMY_FILE", DATA_DIR / "tags.json"))
+
+# How often (seconds) the classifier may stat the taxonomy file for changes
+RELOAD_CHECK_INTERVAL = float(os.getenv("INTENT_TAXONOMY_RELOAD_INTERVAL", "2"))
+
+
+class IntentTaxonomy:
+    """
+    Immutable, compiled view of the intent taxonomy file.
+    Each intent's keywords are folded into a single regex so classification
+    is one search per intent, evaluated in file order (first match wins).
+    """
+
+    def __init__(self, data, mtime=None):
+        self.mtime = mtime
+        self.fallback = data.get("fallback", "other")
+        self.intents = [dict(entry) for entry in data.get("intents", [])]
+        self._rules = []
+        for entry in self.intents:
+            intent_id = entry["id"]
+            if intent_id == self.fallback:
+                continue
+            keywords = [k.lower() for k in entry.get("keywords", []) if k]
+            pattern = None
+            if keywords:
+                pattern = re.compile("|".join(re.escape(k) for k in keywords))
+            suffixes = tuple(entry.get("suffixes", []))
+            if pattern or suffixes:
+                self._rules.append((intent_id, pattern, suffixes))
+
+    @classmethod
+    def from_file(cls, path):
+        mtime = os.stat(path).st_mtime_ns
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f), mtime=mtime)
+
+    def classify(self, text):
+        text = text.lower().strip()
+        for intent_id, pattern, suffixes in self._rules:
+            if suffixes and text.endswith(suffixes):
+                return intent_id
+            if pattern is not None and pattern.search(text):
+                return intent_id
+        return self.fallback
+
+    def categories(self):
+        return {
+            entry["id"]: {
+                "name": entry.get("name", entry["id"]),
+                "description": entry.get("description", ""),
+                "keywords": list(entry.get("keywords", [])),
+            }
+            for entry in self.intents
+        }
+
+    def prompt_lines(self):
+        """Intent list formatted for the LLM system prompt."""
+        return "".join(
+            f"   - {entry['id']}: {entry.get('description', '')}\n" for entry in self.intents
+        )
+
+
+_taxonomy = None
+_last_check = 0.0
+_reload_lock = threading.Lock()
+
+
+def _maybe_reload():
+    global _taxonomy, _last_check
+    with _reload_lock:
+        now = time.monotonic()
+        if _taxonomy is not None and now - _last_check < RELOAD_CHECK_INTERVAL:
+            return
+        _last_check = now
+        try:
+            mtime = os.stat(TAXONOMY_FILE).st_mtime_ns
+            if _taxonomy is not None and mtime == _taxonomy.mtime:
+                return
+            # Build the new taxonomy fully before publishing it, so readers
+            # only ever see the old or the new one
+            _taxonomy = IntentTaxonomy.from_file(TAXONOMY_FILE)
+        except (OSError, ValueError, KeyError) as e:
+            if _taxonomy is None:
+                raise RuntimeError(f"Could not load intent taxonomy from {TAXONOMY_FILE}: {e}")
+            # Keep serving the last good taxonomy while the file is mid-edit or invalid
+
+
+def get_taxonomy():
+    """Return the current compiled taxonomy, reloading it if the file changed."""
+    if _taxonomy is None or time.monotonic() - _last_check >= RELOAD_CHECK_INTERVAL:
+        _maybe_reload()
+    return _taxonomy
@@ -0,0 +1,200 @@
+import asyncio
+import itertools
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+JOBS_DIR = DATA_DIR / "jobs"
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "8"))
+JOB_RETENTION = float(os.getenv("JOB_RETENTION_HOURS", "24")) * 3600
+
+FINISHED = ("done", "cancelled")
+
+
+class JobNotFound(KeyError):
+    pass
+
+
+class JobManager:
+    """Background batches of items, run by a pool of asyncio workers.
+
+    ``process(item)`` is awaited once per item; its return value (or the
+    exception message) becomes that item's result. Workers take items in
+    priority order (higher first), oldest job first within a priority, so
+    an urgent job overtakes a long one between items. Each job is one JSON
+    file under ``data/jobs``, written on submit and then every
+    ``flush_interval`` seconds while it changes; jobs that were queued or
+    running when the server stopped resume on ``start()``. Items finished
+    after the last flush before a crash run again.
+    """
+
+    def __init__(self, process, path=JOBS_DIR, workers=JOB_WORKERS, flush_interval=1.0):
+        self.process = process
+        self.path = Path(path)
+        self.workers = workers
+        self.flush_interval = flush_interval
+        self._jobs = self._load()
+        self._seq = itertools.count()
+        self._dirty = set()
+        self._tasks = []
+        self._queue = None
+        self._updated = None
+
+    # --- storage ---
+    def _load(self):
+        jobs = {}
+        for file in self.path.glob("*.json"):
+            try:
+                with open(file, "r", encoding="utf-8") as f:
+                    job = json.load(f)
+                jobs[job["id"]] = job
+            except (OSError, ValueError, KeyError):
+                continue
+        return jobs
+
+    def _write(self, job_id, body):
+        file = self.path / f"{job_id}.json"
+        if body is None:
+            file.unlink(missing_ok=True)
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp = file.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(body)
+        os.replace(tmp, file)
+
+    async def flush(self):
+        dirty, self._dirty = self._dirty, set()
+        cutoff = time.time() - JOB_RETENTION
+        for job_id, job in list(self._jobs.items()):
+            if job["status"] in FINISHED and (job["finished_at"] or 0) < cutoff:
+                del self._jobs[job_id]
+                dirty.add(job_id)
+        for job_id in dirty:
+            # Encode on the loop so the thread never sees a job mid-update
+            job = self._jobs.get(job_id)
+            await asyncio.to_thread(self._write, job_id, json.dumps(job) if job else None)
+
+    async def _flusher(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    # --- lifecycle ---
+    async def start(self):
+        """Start the workers and requeue unfinished jobs; safe to call on every request."""
+        if self._tasks:
+            return self
+        self._queue = asyncio.PriorityQueue()
+        self._updated = asyncio.Condition()
+        for job in sorted(self._jobs.values(), key=lambda j: j["created_at"]):
+            if job["status"] not in FINISHED:
+                job["status"] = "queued" if not job["done_order"] else "running"
+                self._enqueue(job)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._flusher()))
+        return self
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.flush()
+
+    def _enqueue(self, job):
+        seq = next(self._seq)
+        for index, result in enumerate(job["results"]):
+            if result is None:
+                self._queue.put_nowait((-job["priority"], seq, index, job["id"]))
+
+    async def _changed(self, job):
+        self._dirty.add(job["id"])
+        async with self._updated:
+            self._updated.notify_all()
+
+    async def _worker(self):
+        while True:
+            _, _, index, job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] in FINISHED or job["results"][index] is not None:
+                continue
+            if job["status"] == "queued":
+                job.update(status="running", started_at=time.time())
+            try:
+                result = {"ok": True, "result": await self.process(job["items"][index])}
+            except Exception as e:
+                result = {"ok": False, "error": str(e)}
+            job["results"][index] = result
+            job["done_order"].append(index)
+            if len(job["done_order"]) == len(job["items"]) and job["status"] == "running":
+                job.update(status="done", finished_at=time.time())
+            await self._changed(job)
+
+    # --- jobs ---
+    async def submit(self, items, priority=0):
+        """Queue a job and write it to disk before returning its summary."""
+        await self.start()
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex[:16], "status": "queued", "priority": priority,
+            "created_at": now, "started_at": None, "finished_at": None,
+            "items": list(items), "results": [None] * len(items), "done_order": [],
+        }
+        if not items:
+            job.update(status="done", finished_at=now)
+        self._jobs[job["id"]] = job
+        await asyncio.to_thread(self._write, job["id"], json.dumps(job))
+        self._enqueue(job)
+        return self.summary(job)
+
+    def _job(self, job_id):
+        try:
+            return self._jobs[job_id]
+        except KeyError:
+            raise JobNotFound(job_id)
+
+    async def cancel(self, job_id):
+        """Drop the job's queued items; items already running still finish and are recorded."""
+        job = self._job(job_id)
+        if job["status"] not in FINISHED:
+            job.update(status="cancelled", finished_at=time.time())
+            await self._changed(job)
+        return self.summary(job)
+
+    @staticmethod
+    def summary(job):
+        return {
+            "job_id": job["id"], "status": job["status"], "priority": job["priority"],
+            "total": len(job["items"]), "completed": len(job["done_order"]),
+            "created_at": job["created_at"], "started_at": job["started_at"], "finished_at": job["finished_at"],
+        }
+
+    def list(self):
+        return [self.summary(j) for j in sorted(self._jobs.values(), key=lambda j: j["created_at"], reverse=True)]
+
+    def results(self, job_id, after=0):
+        """Results in completion order from position ``after`` on, each tagged with its item index."""
+        job = self._job(job_id)
+        return [dict(job["results"][i], index=i, seq=n) for n, i in enumerate(job["done_order"][after:], after)]
+
+    def get(self, job_id, after=0):
+        return dict(self.summary(self._job(job_id)), results=self.results(job_id, after))
+
+    async def follow(self, job_id, after=0):
+        """Yield results as items finish (starting at position ``after``), then the final summary."""
+        job = self._job(job_id)
+        while True:
+            async with self._updated:
+                while len(job["done_order"]) <= after and job["status"] not in FINISHED:
+                    await self._updated.wait()
+            for result in self.results(job_id, after):
+                after += 1
+                yield "result", result
+            if job["status"] in FINISHED:
+                yield "status", self.summary(job)
+                return
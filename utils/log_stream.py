@@ -0,0 +1,116 @@
+import asyncio
+import json
+import os
+import threading
+from collections import deque
+
+LOG_STREAM_HISTORY = int(os.getenv("LOG_STREAM_HISTORY", "1000"))
+LOG_STREAM_QUEUE = int(os.getenv("LOG_STREAM_QUEUE", "256"))
+
+
+class LogEvent:
+    __slots__ = ("seq", "data")
+
+    def __init__(self, seq, entry):
+        self.seq = seq
+        # Encoded once here, shared by every subscriber
+        self.data = json.dumps({
+            "seq": seq,
+            "entry": entry,
+            "stats": {"totalMessages": 1, "messagesByIntent": {entry.get("intent", "unknown"): 1}},
+        })
+
+
+class _Subscription:
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(LOG_STREAM_QUEUE)
+        self.overflowed = False
+
+    def deliver(self, events):
+        for event in events:
+            try:
+                self.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Too far behind; the subscriber catches up from history instead
+                self.overflowed = True
+                return
+
+
+class LogBroadcaster:
+    """Fans new log entries out to any number of async subscribers.
+
+    An entry's sequence number is its 1-based position in the log, so a
+    client can reconnect with the last number it saw and miss nothing.
+    ``publish`` is called by the log writer (on any thread, in write
+    order); the last ``history`` events are kept in memory for resuming,
+    and older gaps are filled from the log itself via ``backfill``.
+    """
+
+    def __init__(self, history=LOG_STREAM_HISTORY):
+        self._lock = threading.Lock()
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self.seq = None
+
+    def publish(self, first_seq, entries):
+        events = [LogEvent(seq, entry) for seq, entry in enumerate(entries, first_seq)]
+        with self._lock:
+            if self._history and self._history[-1].seq != first_seq - 1:
+                self._history.clear()  # the log was rewritten elsewhere; history no longer lines up
+            self._history.extend(events)
+            self.seq = events[-1].seq if events else first_seq - 1
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub.deliver, events)
+            except RuntimeError:
+                # Its loop is closed; the entry is already in the log, just drop the subscriber
+                with self._lock:
+                    self._subscribers.discard(sub)
+
+    def _buffered(self, after):
+        with self._lock:
+            if self._history and self._history[0].seq <= after + 1:
+                return [e for e in self._history if e.seq > after]
+            if self.seq is not None and after >= self.seq:
+                return []
+        return None
+
+    async def follow(self, after, backfill):
+        """Yield LogEvents with seq > ``after`` as they are written, forever.
+
+        ``backfill(after)`` is awaited for events older than the in-memory
+        history and returns ``(entries after that position, log length)``.
+        """
+        sub = _Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(sub)
+        try:
+            while True:
+                # Catch up first; anything written meanwhile also lands in the queue
+                events = self._buffered(after)
+                if events is None:
+                    entries, length = await backfill(after)
+                    after = min(after, length - len(entries))
+                    events = [LogEvent(seq, e) for seq, e in enumerate(entries, after + 1)]
+                for event in events:
+                    yield event
+                    after = event.seq
+                sub.overflowed = False
+                while not sub.overflowed:
+                    event = await sub.queue.get()
+                    if event.seq <= after:
+                        continue
+                    if event.seq > after + 1:
+                        break
+                    yield event
+                    after = event.seq
+                while not sub.queue.empty():
+                    sub.queue.get_nowait()
+        finally:
+            with self._lock:
+                self._subscribers.discard(sub)
+
+
+log_broadcaster = LogBroadcaster()
@@ -1,10 +1,15 @@
+import asyncio
 import json
 import os
 from filelock import FileLock
 from pathlib import Path
+import anyio
+import httpx
 import requests
 from dotenv import load_dotenv
 from datetime import datetime
+from utils.intent_taxonomy import get_taxonomy
+from utils.log_stream import log_broadcaster
 
 load_dotenv()
 
@@ -15,6 +20,9 @@ OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
 OPENROUTER_MODEL = os.getenv("OPENROUTER_MODEL", "deepseek/deepseek-r1-0528:free")
 USE_OPENROUTER = os.getenv("USE_OPENROUTER", "1") == "1"
+# Async callers: LLM requests in flight at once, and threads reserved for log file I/O
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LOG_IO_THREADS = int(os.getenv("LOG_IO_THREADS", "4"))
 
 # --- JSON helpers ---
 def _read_json(path):
@@ -34,18 +42,49 @@ def get_logs():
     return _read_json(LOG_FILE)
 
 def add_log_entry(entry):
-    log = _read_json(LOG_FILE)
-    log.append(entry)
-    _write_json(LOG_FILE, log)
+    add_log_entries([entry])
     return entry
 
+def add_log_entries(entries):
+    # One lock around read-append-write, or concurrent writers drop each other's entries
+    with FileLock(str(LOG_FILE) + ".lock"):
+        log = []
+        if LOG_FILE.exists():
+            with open(LOG_FILE, "r", encoding="utf-8") as f:
+                log = json.load(f)
+        first_seq = len(log) + 1
+        log.extend(entries)
+        with open(LOG_FILE, "w", encoding="utf-8") as f:
+            json.dump(log, f, indent=2)
+        # Still under the lock, so subscribers see entries in log order
+        log_broadcaster.publish(first_seq, entries)
+    return entries
+
+def log_generation():
+    """Token that changes on every log write (file identity, mtime and size), without reading the log."""
+    try:
+        st = LOG_FILE.stat()
+    except FileNotFoundError:
+        return "0"
+    return f"{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}"
+
+# Log I/O from async handlers runs on its own few threads, so a slow disk or a
+# held file lock never eats the threads (or the event loop) other requests need
+_log_limiter = None
+
+async def run_log_io(fn, *args):
+    global _log_limiter
+    if _log_limiter is None:
+        _log_limiter = anyio.CapacityLimiter(LOG_IO_THREADS)
+    return await anyio.to_thread.run_sync(fn, *args, limiter=_log_limiter)
+
+async def aadd_log_entries(entries):
+    return await run_log_io(add_log_entries, entries)
+
 # --- LLM (DeepSeek R1 via OpenRouter) ---
-def openrouter_chat_completion(messages, model=None, temperature=0.7, max_tokens=512, timeout=60):
-    if not USE_OPENROUTER:
-        return None
+def _openrouter_request(messages, model, temperature, max_tokens):
     if not OPENROUTER_API_KEY:
         raise RuntimeError("OPENROUTER_API_KEY not set in environment.")
-    model = model or OPENROUTER_MODEL
     headers = {
         "Authorization": f"Bearer {OPENROUTER_API_KEY}",
         "Content-Type": "application/json",
@@ -53,144 +92,78 @@ def openrouter_chat_completion(messages, model=None, temperature=0.7, max_tokens
         "X-Title": "ThreadMind DM Assistant"
     }
     data = {
-        "model": model,
+        "model": model or OPENROUTER_MODEL,
         "messages": messages,
         "temperature": temperature,
         "max_tokens": max_tokens
     }
+    return headers, data
+
+def _openrouter_content(result):
+    content = result["choices"][0]["message"]["content"]
+    return content.strip() if content else "[No response from OpenRouter]"
+
+def openrouter_chat_completion(messages, model=None, temperature=0.7, max_tokens=512, timeout=60):
+    if not USE_OPENROUTER:
+        return None
+    headers, data = _openrouter_request(messages, model, temperature, max_tokens)
     try:
         response = requests.post(OPENROUTER_URL, headers=headers, json=data, timeout=timeout)
         if response.status_code == 429:
             return "[Rate limited: Please try again later.]"
         response.raise_for_status()
-        result = response.json()
-        content = result["choices"][0]["message"]["content"]
-        return content.strip() if content else "[No response from OpenRouter]"
+        return _openrouter_content(response.json())
     except requests.exceptions.Timeout:
         return "[OpenRouter API timeout]"
     except Exception as e:
         return f"[OpenRouter API error: {e}]"
 
-# --- Enhanced Intent Classification ---
+# Shared across requests so connections (and TLS sessions) to OpenRouter are reused
+_http = None
+_llm_slots = None
+
+def _async_http():
+    global _http, _llm_slots
+    if _http is None:
+        _http = httpx.AsyncClient(limits=httpx.Limits(max_connections=LLM_MAX_CONCURRENCY))
+        _llm_slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _http
+
+async def aclose_http():
+    global _http
+    if _http is not None:
+        await _http.aclose()
+        _http = None
+
+async def openrouter_chat_completion_async(messages, model=None, temperature=0.7, max_tokens=512, timeout=60):
+    """Non-blocking openrouter_chat_completion; at most LLM_MAX_CONCURRENCY requests run at once."""
+    if not USE_OPENROUTER:
+        return None
+    headers, data = _openrouter_request(messages, model, temperature, max_tokens)
+    http = _async_http()
+    try:
+        async with _llm_slots:
+            response = await http.post(OPENROUTER_URL, headers=headers, json=data, timeout=timeout)
+        if response.status_code == 429:
+            return "[Rate limited: Please try again later.]"
+        response.raise_for_status()
+        return _openrouter_content(response.json())
+    except httpx.TimeoutException:
+        return "[OpenRouter API timeout]"
+    except Exception as e:
+        return f"[OpenRouter API error: {e}]"
+
+# --- Intent Classification (taxonomy lives in data/tags.json) ---
 def classify_intent(text):
     """
-    Enhanced intent classification with 12 categories
-    Returns one of: greeting, pricing_inquiry, support_request, sales_lead, 
-    complaint, spam, question, appointment, feedback, partnership, 
-    general_inquiry, other
+    Classify a message into one of the intents defined in data/tags.json.
+    Intents are checked in file order; the taxonomy's fallback intent
+    (default "other") is returned when nothing matches.
     """
-    text = text.lower().strip()
-    
-    # Greeting patterns
-    greeting_words = ["hello", "hi", "hey", "greetings", "good morning", "good afternoon", "good evening", "sup", "yo"]
-    if any(word in text for word in greeting_words):
-        return "greeting"
-    
-    # Pricing inquiry patterns
-    pricing_words = ["price", "cost", "how much", "rate", "pricing", "fee", "charge", "budget", "afford", "expensive", "cheap"]
-    if any(word in text for word in pricing_words):
-        return "pricing_inquiry"
-    
-    # Support request patterns
-    support_words = ["help", "support", "issue", "problem", "trouble", "broken", "not working", "error", "fix", "resolve"]
-    if any(word in text for word in support_words):
-        return "support_request"
-    
-    # Sales lead patterns
-    sales_words = ["buy", "interested", "purchase", "order", "sign up", "subscribe", "get started", "book", "reserve", "want to buy"]
-    if any(word in text for word in sales_words):
-        return "sales_lead"
-    
-    # Complaint patterns
-    complaint_words = ["bad", "complaint", "angry", "disappointed", "upset", "frustrated", "terrible", "awful", "hate", "worst", "unhappy"]
-    if any(word in text for word in complaint_words):
-        return "complaint"
-    
-    # Spam patterns
-    spam_words = ["spam", "unsubscribe", "stop", "remove", "delete", "block", "report"]
-    if any(word in text for word in spam_words):
-        return "spam"
-    
-    # Appointment/booking patterns
-    appointment_words = ["appointment", "schedule", "book", "reserve", "meeting", "call", "consultation", "session"]
-    if any(word in text for word in appointment_words):
-        return "appointment"
-    
-    # Feedback patterns
-    feedback_words = ["feedback", "review", "rating", "opinion", "thoughts", "suggestions", "improve", "better"]
-    if any(word in text for word in feedback_words):
-        return "feedback"
-    
-    # Partnership/collaboration patterns
-    partnership_words = ["partnership", "collaborate", "work together", "joint", "team up", "business", "opportunity", "deal"]
-    if any(word in text for word in partnership_words):
-        return "partnership"
-    
-    # General inquiry patterns (questions that don't fit other categories)
-    if text.endswith("?") or any(word in text for word in ["what", "when", "where", "why", "how", "who", "which"]):
-        return "general_inquiry"
-    
-    # Default fallback
-    return "other"
+    return get_taxonomy().classify(text)
 
 def get_intent_categories():
     """
     Get all available intent categories with descriptions
     """
-    return {
-        "greeting": {
-            "name": "Greeting",
-            "description": "Initial contact, hellos, introductions",
-            "keywords": ["hello", "hi", "hey", "greetings", "good morning"]
-        },
-        "pricing_inquiry": {
-            "name": "Pricing Inquiry", 
-            "description": "Questions about costs, rates, pricing",
-            "keywords": ["price", "cost", "how much", "rate", "pricing"]
-        },
-        "support_request": {
-            "name": "Support Request",
-            "description": "Help requests, technical issues, problems",
-            "keywords": ["help", "support", "issue", "problem", "trouble"]
-        },
-        "sales_lead": {
-            "name": "Sales Lead",
-            "description": "Purchase interest, buying intent, orders",
-            "keywords": ["buy", "interested", "purchase", "order", "sign up"]
-        },
-        "complaint": {
-            "name": "Complaint",
-            "description": "Negative feedback, complaints, dissatisfaction",
-            "keywords": ["bad", "complaint", "angry", "disappointed", "upset"]
-        },
-        "spam": {
-            "name": "Spam",
-            "description": "Unwanted messages, unsubscribe requests",
-            "keywords": ["spam", "unsubscribe", "stop", "remove", "block"]
-        },
-        "appointment": {
-            "name": "Appointment",
-            "description": "Scheduling requests, bookings, meetings",
-            "keywords": ["appointment", "schedule", "book", "meeting", "call"]
-        },
-        "feedback": {
-            "name": "Feedback",
-            "description": "Reviews, ratings, suggestions, opinions",
-            "keywords": ["feedback", "review", "rating", "opinion", "thoughts"]
-        },
-        "partnership": {
-            "name": "Partnership",
-            "description": "Business opportunities, collaborations, deals",
-            "keywords": ["partnership", "collaborate", "work together", "business"]
-        },
-        "general_inquiry": {
-            "name": "General Inquiry",
-            "description": "General questions, information requests",
-            "keywords": ["what", "when", "where", "why", "how", "who"]
-        },
-        "other": {
-            "name": "Other",
-            "description": "Miscellaneous messages, unclear intent",
-            "keywords": ["fallback", "miscellaneous", "unclear"]
-        }
-    }
\ No newline at end of file
+    return get_taxonomy().categories()
@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+OUTBOX_FILE = DATA_DIR / "auto_dm_outbox.json"
+
+MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+RETRY_BASE = float(os.getenv("OUTBOX_RETRY_BASE", "30"))
+RETENTION = float(os.getenv("OUTBOX_RETENTION_DAYS", "7")) * 86400
+
+
+def outbox_key(thread_id, message_id):
+    """Idempotency key: one reply per incoming message."""
+    return f"{thread_id}:{message_id}"
+
+
+class Outbox:
+    """Durable queue of generated replies, persisted to one JSON file.
+
+    Replies are written (and flushed) before any send is attempted, so a
+    crash never loses an LLM result. Sends are drained per thread, oldest
+    first; a failure is retried with exponential backoff and holds back the
+    rest of that thread to keep replies in order. Sent/failed marks are
+    batched: flushed every ``flush_every`` changes or ``flush_interval``
+    seconds, and by ``flush()``. A send that lands just before a crash is
+    recognised afterwards through ``is_handled`` (the caller's watermark),
+    so it isn't repeated.
+    """
+
+    def __init__(self, path=OUTBOX_FILE, max_attempts=MAX_ATTEMPTS, flush_every=20, flush_interval=2.0):
+        self.path = Path(path)
+        self.max_attempts = max_attempts
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self._thread_locks = {}
+        self._entries = self._load()
+        self._dirty = 0
+        self._flushed_at = time.monotonic()
+
+    # --- storage ---
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            cutoff = time.time() - RETENTION
+            self._entries = {
+                k: e for k, e in self._entries.items()
+                if e["status"] == "pending" or e["updated_at"] >= cutoff
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp, self.path)
+            self._dirty = 0
+            self._flushed_at = time.monotonic()
+
+    def _changed(self):
+        self._dirty += 1
+        if self._dirty >= self.flush_every or time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    # --- queue ---
+    def __contains__(self, key):
+        return key in self._entries
+
+    def enqueue(self, thread_id, replies):
+        """Durably add replies (dicts with message_id, timestamp, username, text); known keys are skipped."""
+        now = time.time()
+        with self._lock:
+            added = 0
+            for reply in replies:
+                key = outbox_key(thread_id, reply["message_id"])
+                if key in self._entries:
+                    continue
+                self._entries[key] = dict(
+                    reply, thread_id=str(thread_id), status="pending", attempts=0,
+                    next_attempt_at=0, last_error=None, created_at=now, updated_at=now,
+                )
+                added += 1
+            if added:
+                self._dirty += added
+                self.flush()
+            return added
+
+    def pending_threads(self):
+        with self._lock:
+            return sorted({e["thread_id"] for e in self._entries.values() if e["status"] == "pending"})
+
+    def next_due_in(self):
+        """Seconds until the earliest pending retry is due (None if nothing is pending)."""
+        with self._lock:
+            due = [e["next_attempt_at"] for e in self._entries.values() if e["status"] == "pending"]
+        return max(0.0, min(due) - time.time()) if due else None
+
+    def _pending(self, thread_id):
+        with self._lock:
+            entries = [e for e in self._entries.values() if e["thread_id"] == str(thread_id) and e["status"] == "pending"]
+        return sorted(entries, key=lambda e: (str(e.get("timestamp") or ""), e["created_at"]))
+
+    def _mark(self, entry, **changes):
+        with self._lock:
+            entry.update(changes, updated_at=time.time())
+            self._changed()
+
+    def drain(self, thread_id, send, is_handled=None):
+        """Send the thread's due replies in order; returns how many were sent.
+
+        ``send(entry)`` returns None on success or an error message.
+        ``is_handled(entry)`` lets the caller skip replies already delivered.
+        """
+        with self._lock:
+            thread_lock = self._thread_locks.setdefault(str(thread_id), threading.Lock())
+        sent = 0
+        with thread_lock:
+            for entry in self._pending(thread_id):
+                if is_handled and is_handled(entry):
+                    self._mark(entry, status="sent")
+                    continue
+                if entry["next_attempt_at"] > time.time():
+                    break
+                error = send(entry)
+                if error is None:
+                    self._mark(entry, status="sent")
+                    sent += 1
+                    continue
+                attempts = entry["attempts"] + 1
+                if attempts >= self.max_attempts:
+                    # Give up on this one so the rest of the thread isn't stuck behind it
+                    self._mark(entry, status="failed", attempts=attempts, last_error=error)
+                    continue
+                self._mark(
+                    entry, attempts=attempts, last_error=error,
+                    next_attempt_at=time.time() + min(RETRY_BASE * 2 ** (attempts - 1), 3600),
+                )
+                break
+        return sent
+
+    def stats(self):
+        with self._lock:
+            counts = {"pending": 0, "sent": 0, "failed": 0}
+            for e in self._entries.values():
+                counts[e["status"]] += 1
+            return counts
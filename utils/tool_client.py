@@ -0,0 +1,254 @@
+import asyncio
+import json
+import os
+import queue
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+WORKER_SOCKET = os.getenv("MCP_WORKER_SOCKET", str(ROOT / "data" / "mcp_worker.sock"))
+WORKER_CMD = [sys.executable, str(ROOT / "src" / "mcp_server.py"), "--worker"]
+
+
+class ToolCallError(RuntimeError):
+    pass
+
+
+class ToolClient:
+    """Pooled client for the long-lived MCP tool worker (src/tool_worker.py).
+
+    Connections are kept open and reused; if no worker is listening and
+    ``autostart`` is set, one is spawned in the background first, with
+    ``env`` added to its environment. ``acall`` is the asyncio flavour of
+    ``call``, with its own pool of stream connections for one event loop.
+    """
+
+    def __init__(self, socket_path=WORKER_SOCKET, pool_size=8, autostart=True, timeout=120, start_timeout=30, env=None):
+        self.socket_path = str(socket_path)
+        self.env = env
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self.autostart = autostart
+        self.pool_size = pool_size
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._apool = []
+        self._start_lock = threading.Lock()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        return sock, sock.makefile("rb")
+
+    def _start_worker(self):
+        with self._start_lock:
+            try:
+                return self._connect()
+            except OSError:
+                pass
+            log_path = Path(self.socket_path).with_suffix(".log")
+            log_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(log_path, "ab") as log:
+                subprocess.Popen(
+                    WORKER_CMD + ["--socket", self.socket_path], cwd=str(ROOT),
+                    env={**os.environ, **self.env} if self.env else None,
+                    stdin=subprocess.DEVNULL, stdout=log, stderr=log, start_new_session=True,
+                )
+            deadline = time.monotonic() + self.start_timeout
+            while time.monotonic() < deadline:
+                try:
+                    return self._connect()
+                except OSError:
+                    time.sleep(0.1)
+            raise ToolCallError(f"Tool worker did not start on {self.socket_path}")
+
+    def _acquire(self):
+        """Return (connection, whether it came from the pool)."""
+        try:
+            return self._pool.get_nowait(), True
+        except queue.Empty:
+            pass
+        try:
+            return self._connect(), False
+        except OSError:
+            if not self.autostart:
+                raise
+            return self._start_worker(), False
+
+    def _release(self, conn):
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            self._close(conn)
+
+    @staticmethod
+    def _close(conn):
+        sock, rfile = conn
+        rfile.close()
+        sock.close()
+
+    def call(self, tool, timeout=None, **args):
+        """Invoke ``tool`` on the worker and return its result dict.
+
+        ``timeout`` overrides the client's per-call socket timeout (seconds).
+        A call is only sent again if the first attempt never reached a live
+        worker: the write failed, or a pooled connection turned out to be
+        closed. A timeout is raised as is, since the tool may still be
+        running (a retried send_message would send twice).
+        """
+        payload = (json.dumps({"tool": tool, "args": args}) + "\n").encode("utf-8")
+        for attempt in range(2):
+            conn, pooled = self._acquire()
+            try:
+                conn[0].settimeout(timeout or self.timeout)
+                conn[0].sendall(payload)
+            except OSError:
+                self._close(conn)
+                # A pooled connection may belong to a worker that has since restarted
+                if attempt:
+                    raise
+                continue
+            try:
+                line = conn[1].readline()
+            except OSError:
+                self._close(conn)
+                raise
+            if not line:
+                self._close(conn)
+                if pooled and not attempt:
+                    continue
+                raise ConnectionError("Tool worker closed the connection")
+            self._release(conn)
+            response = json.loads(line)
+            if not response.get("ok"):
+                raise ToolCallError(response.get("error", "Unknown tool worker error"))
+            return response["result"]
+
+    # --- asyncio ---
+    async def _aconnect(self):
+        # Tool results can be far larger than asyncio's 64 KiB default line limit
+        return await asyncio.open_unix_connection(self.socket_path, limit=64 * 1024 * 1024)
+
+    async def _aacquire(self):
+        if self._apool:
+            return self._apool.pop(), True
+        try:
+            return await self._aconnect(), False
+        except OSError:
+            if not self.autostart:
+                raise
+        # Spawning and waiting for a worker blocks; keep it off the event loop
+        self._close(await asyncio.to_thread(self._start_worker))
+        return await self._aconnect(), False
+
+    def _arelease(self, conn):
+        if len(self._apool) < self.pool_size:
+            self._apool.append(conn)
+        else:
+            conn[1].close()
+
+    async def acall(self, tool, timeout=None, **args):
+        """Like ``call``, without blocking the event loop while the worker runs the tool."""
+        payload = (json.dumps({"tool": tool, "args": args}) + "\n").encode("utf-8")
+        for attempt in range(2):
+            conn, pooled = await self._aacquire()
+            reader, writer = conn
+            try:
+                writer.write(payload)
+                await writer.drain()
+            except OSError:
+                writer.close()
+                if attempt:
+                    raise
+                continue
+            except BaseException:
+                writer.close()
+                raise
+            try:
+                line = await asyncio.wait_for(reader.readline(), timeout or self.timeout)
+            except BaseException:
+                # Timed out or cancelled mid-call: the reply would land on the next caller's request
+                writer.close()
+                raise
+            if not line:
+                writer.close()
+                if pooled and not attempt:
+                    continue
+                raise ConnectionError("Tool worker closed the connection")
+            self._arelease(conn)
+            response = json.loads(line)
+            if not response.get("ok"):
+                raise ToolCallError(response.get("error", "Unknown tool worker error"))
+            return response["result"]
+
+    def close(self):
+        while self._apool:
+            self._apool.pop()[1].close()
+        while True:
+            try:
+                self._close(self._pool.get_nowait())
+            except queue.Empty:
+                return
+
+
+class AccountRouter:
+    """Dispatches tool calls to one worker process per Instagram account.
+
+    Each account's worker (``INSTAGRAM_ACCOUNT=<id>``) owns that account's
+    session, throttle and caches, so accounts run on separate cores and a
+    block on one never stalls the others. Workers start on first use.
+    """
+
+    def __init__(self, accounts, **client_options):
+        from utils.accounts import account_socket
+
+        self.accounts = list(accounts)
+        self._clients = {
+            account: ToolClient(account_socket(account), env={"INSTAGRAM_ACCOUNT": account}, **client_options)
+            for account in self.accounts
+        }
+
+    def client(self, account=None):
+        """The worker client for ``account``, or None if it isn't configured."""
+        return self._clients.get(account or self.accounts[0])
+
+    def _unknown(self, account):
+        return {"success": False, "error": f"Unknown account '{account}'; configured: {', '.join(self.accounts)}"}
+
+    def call(self, tool, account=None, timeout=None, **args):
+        """Invoke ``tool`` on ``account``'s worker (the first configured account by default).
+
+        An unknown account gets the tools' usual failure dict rather than an exception.
+        """
+        client = self.client(account)
+        if client is None:
+            return self._unknown(account)
+        return client.call(tool, timeout=timeout, **args)
+
+    async def acall(self, tool, account=None, timeout=None, **args):
+        client = self.client(account)
+        if client is None:
+            return self._unknown(account)
+        return await client.acall(tool, timeout=timeout, **args)
+
+    def close(self):
+        for client in self._clients.values():
+            client.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_tool_client():
+    """Process-wide shared ToolClient."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ToolClient()
+    return _client